@@ -12,11 +12,77 @@ class Config:
     
     # Database
     DATABASE_PATH = DATABASE_DIR / "eric_memory.db"
+    SQLITE_JOURNAL_MODE = "WAL"
+    SQLITE_SYNCHRONOUS = "NORMAL"
+    SQLITE_CACHE_SIZE = -16000  # Negative means KiB, i.e. ~16 MB page cache
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT = 5.0
+    SQLITE_STATEMENT_CACHE_SIZE = 128
+    
+    # Memory search
+    MEMORY_SEARCH_CANDIDATES = 200  # BM25 hits considered before reranking
+    MEMORY_RECENCY_HALF_LIFE_DAYS = 30.0
+    SEMANTIC_MIN_SCORE = 0.25  # Cosine floor for semantic fallback results
+    MEMORY_CACHE_SIZE = 256
+    MEMORY_CACHE_TTL = 300  # Seconds; writes invalidate entries before this
+    STREAM_CHUNK_SIZE = 500  # Rows fetched per keyset page when streaming
+    
+    # Semantic vector index
+    VECTOR_INDEX_DIR = DATA_DIR / "vector_index"
+    VECTOR_ENCODER = "hashing"  # Or "package.module:EncoderClass" with .dim and .encode()
+    VECTOR_DIM = 256
+    VECTOR_INITIAL_CAPACITY = 1024
+    VECTOR_SYNC_BATCH_SIZE = 512
+    VECTOR_SEARCH_BLOCK = 65536  # Rows scored per block in brute-force search
+    VECTOR_IVF_THRESHOLD = 50000  # Switch to partitioned search above this many rows
+    VECTOR_IVF_NPROBE = 8
+    VECTOR_IVF_TRAIN_SAMPLE = 50000
+    VECTOR_IVF_TRAIN_ITERATIONS = 10
+    VECTOR_TYPE_FILTER_OVERFETCH = 4
+    
+    # Emotion history retention (rollups keep the aggregates)
+    EMOTION_RAW_RETENTION_DAYS = 30
+    EMOTION_HOURLY_RETENTION_DAYS = 90
+    EMOTION_COMPACTION_INTERVAL = 24 * 60 * 60  # Seconds between compactions
+    
+    # Conversation context
+    CONTEXT_DB_CLEANUP_INTERVAL = 300  # Seconds between batched expired-row deletes
+    PROCESSING_LOOP_MAX_WAIT = 30.0  # Longest idle sleep of the processing loop
+    
+    # Write-behind group commit for emotion/memory inserts
+    WRITE_BEHIND_ENABLED = False
+    WRITE_BEHIND_QUEUE_SIZE = 1000
+    WRITE_BEHIND_BATCH_SIZE = 200
+    WRITE_BEHIND_FLUSH_INTERVAL = 0.05  # Seconds to gather a batch
+    WRITE_BEHIND_PUT_TIMEOUT = 0.5  # Seconds to block before writing directly
+    WRITE_BEHIND_WAIT_TIMEOUT = 5.0  # Seconds a read waits for the user's queued writes
+    WRITE_BEHIND_RETRIES = 3  # Attempts per row after its batch fails
     
     # Models
-    NLP_MODEL_PATH = MODEL_DIR / "nlp_model.pkl"
+    NLP_MODEL_PATH = MODEL_DIR / "nlp_model"  # Directory of memory-mapped .npy arrays
     EMOTION_MODEL_PATH = MODEL_DIR / "emotion_model.pkl"
-    FACE_ENCODINGS_PATH = MODEL_DIR / "face_encodings.pkl"
+    EMOTION_LINEAR_MODEL_PATH = MODEL_DIR / "emotion_linear"  # Directory of memory-mapped .npy arrays
+    FACE_ENCODINGS_PATH = MODEL_DIR / "face_encodings"  # Legacy arrays; imported into the database once, then renamed *.imported
+    LEMMA_TABLE_PATH = MODEL_DIR / "lemmas.json"  # Built once from WordNet
+    PREDICTION_CACHE_SIZE = 512  # Repeated utterances served without re-running models
+    MODEL_BACKGROUND_RETRAIN = False  # Serve the previous model while a stale one retrains
+    EMOTION_ENGINE = "svc"  # "svc" (Platt-calibrated SVC) or "linear" (logistic regression)
+    EMOTION_TEXTBLOB = True  # Let TextBlob sentiment override less confident model predictions
+    
+    # Shared featurization (one vocabulary and one vectorization for intent and emotion)
+    SHARED_FEATURES = False
+    SHARED_FEATURES_PATH = MODEL_DIR / "shared_features"  # Directory of memory-mapped .npy arrays
+    
+    # Online intent learning (hashing features + incrementally updated naive Bayes)
+    ONLINE_INTENT_LEARNING = False
+    ONLINE_INTENT_MODEL_PATH = MODEL_DIR / "intent_online"
+    INTENT_JOURNAL_PATH = MODEL_DIR / "intent_examples.jsonl"  # Every taught example
+    ONLINE_INTENT_FEATURES = 2 ** 18
+    ONLINE_INTENT_ALPHA = 0.1
+    
+    # Intent router fast paths in front of the NLP model
+    ROUTER_MIN_PREFIX_COVERAGE = 0.6  # Share of utterance words a known phrase prefix must cover
+    ROUTER_FILLER_WORDS = frozenset({"please", "eric", "now", "thanks"})
     
     # Voice settings
     VOICE_RATE = 150
@@ -24,6 +90,23 @@ class Config:
     
     # Security
     FACE_RECOGNITION_TOLERANCE = 0.6
+    FACE_GALLERY_CAPACITY = 1024  # Rows preallocated for encodings; doubles when full
+    FACE_INDEX = "auto"  # "exact", "partitioned", or "auto" (partitioned past the threshold)
+    FACE_INDEX_PARTITION_THRESHOLD = 20000  # Enrolled faces before "auto" switches index
+    FACE_INDEX_PROBES = 16  # Nearest cells a partitioned search scans
+    FACE_DECODE_REDUCTION = 1  # Camera frames are decoded at 1/N size (1, 2, 4 or 8)
+    FACE_TRACKING = True  # Follow faces across frames instead of detecting and encoding each one
+    FACE_DETECTION_SCALE = 0.5  # Frames are resized by this factor for detection and tracking
+    FACE_TRACKING_DETECT_EVERY = 10  # Frames between detections while faces are tracked
+    FACE_TRACKING_VERIFY_EVERY = 30  # Frames before a tracked face is encoded and matched again
+    FACE_TRACKING_MIN_SCORE = 0.6  # Template correlation below which a track is lost
+    FACE_TRACKING_SEARCH_MARGIN = 0.5  # Search window around a track, in face sizes
+    FACE_TRACKING_MAX_GAP = 1.0  # Seconds without frames after which tracks are dropped
+    FACE_STREAM_TRANSPORT = "binary"  # "binary" (JPEG bodies posted over HTTP) or "dataurl" (base64 through Eel)
+    FACE_STREAM_WIDTH = 640  # Camera frames are downscaled to at most this width before sending
+    FACE_STREAM_FPS = 5  # Frames per second the camera sends while authenticating
+    FACE_STREAM_JPEG_QUALITY = 0.8
+    FACE_STREAM_MAX_BYTES = 1024 * 1024  # Largest frame body accepted
     MAX_LOGIN_ATTEMPTS = 3
     
     # API Keys (set as environment variables)
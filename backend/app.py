@@ -10,6 +10,7 @@ from pathlib import Path
 # Import our modules
 from config import Config
 from database.init_db import initialize_database
+from database.connection_pool import close_all_pools
 from core.memory_manager import MemoryManager
 from core.voice_handler import VoiceHandler
 from core.scheduler import TaskScheduler
@@ -17,6 +18,10 @@ from core.context_manager import ContextManager
 from models.nlp_model import NLPModel
 from models.emotion_detector import EmotionDetector
 from models.face_recognition import FaceRecognitionSystem
+from models.features import SharedFeaturizer
+from models.registry import ensure_trained
+from models.task_classifier import IntentRouter
+from utils.image_io import decode_image
 
 class EricAIAssistant:
     def __init__(self):
@@ -28,8 +33,10 @@ class EricAIAssistant:
         self.voice_handler = VoiceHandler()
         self.scheduler = TaskScheduler(self.memory_manager)
         self.context_manager = ContextManager(self.memory_manager)
-        self.nlp_model = NLPModel()
-        self.emotion_detector = EmotionDetector()
+        self.featurizer = SharedFeaturizer() if Config.SHARED_FEATURES else None
+        self.nlp_model = NLPModel(self.featurizer)
+        self.intent_router = IntentRouter(self.nlp_model)
+        self.emotion_detector = EmotionDetector(self.featurizer)
         self.face_recognition = FaceRecognitionSystem()
         
         # State management
@@ -45,7 +52,7 @@ class EricAIAssistant:
         self.scheduler.add_reminder_callback(self.handle_reminder)
         
     def train_models_if_needed(self):
-        """Train models if they don't exist."""
+        """Train models whose artifacts are missing or built from other data/settings."""
         # Training data for intents
         intent_data = {
             "intents": {
@@ -84,12 +91,6 @@ class EricAIAssistant:
             }
         }
         
-        # Train NLP model
-        try:
-            self.nlp_model.train_model(intent_data)
-        except Exception as e:
-            print(f"Error training NLP model: {e}")
-        
         # Emotion training data
         emotion_data = {
             "emotions": {
@@ -120,11 +121,32 @@ class EricAIAssistant:
             }
         }
         
+        # The shared vocabulary spans both corpora, so it is fitted first. Always in
+        # the foreground: the models below are trained against it
+        if self.featurizer:
+            texts = SharedFeaturizer.training_texts(intent_data, emotion_data)
+            ensure_trained(
+                "shared features", Config.SHARED_FEATURES_PATH, self.featurizer.fingerprint(texts),
+                self.featurizer.vectorizer is not None,
+                lambda: self.featurizer.fit(texts)
+            )
+        
+        # Train NLP model
+        ensure_trained(
+            "NLP", self.nlp_model.model_path, self.nlp_model.fingerprint(intent_data),
+            self.nlp_model.pipeline is not None,
+            lambda: self.nlp_model.train_model(intent_data),
+            background=Config.MODEL_BACKGROUND_RETRAIN
+        )
+        self.intent_router.build(intent_data, self.nlp_model.taught_examples())
+        
         # Train emotion model
-        try:
-            self.emotion_detector.train_text_emotion_model(emotion_data)
-        except Exception as e:
-            print(f"Error training emotion model: {e}")
+        ensure_trained(
+            "emotion", self.emotion_detector.model_path, self.emotion_detector.fingerprint(emotion_data),
+            self.emotion_detector.text_pipeline is not None,
+            lambda: self.emotion_detector.train_text_emotion_model(emotion_data),
+            background=Config.MODEL_BACKGROUND_RETRAIN
+        )
     
     def start(self):
         """Start the Eric AI Assistant."""
@@ -136,6 +158,9 @@ class EricAIAssistant:
         # Load context from database
         self.context_manager.load_context_from_db()
         
+        # Embed memories stored while the app was not running
+        self.memory_manager.sync_semantic_index()
+        
         # Start voice listening in background
         self.voice_handler.start_continuous_listening()
         
@@ -144,21 +169,35 @@ class EricAIAssistant:
         
         print("Eric AI Assistant started successfully!")
     
+    def shutdown(self):
+        """Release resources before the process exits."""
+        print("Shutting down Eric AI Assistant...")
+        self.voice_handler.stop_listening()
+        self.memory_manager.close()
+        close_all_pools()
+    
     def start_processing_loop(self):
         """Start the main processing loop."""
         def processing_loop():
+            last_compaction = 0.0
             while True:
                 try:
-                    # Check for voice commands
-                    if self.voice_handler.has_commands():
-                        command = self.voice_handler.get_command()
-                        if command:
-                            self.process_command(command, source="voice")
+                    # Sleep until a voice command arrives or context next expires
+                    timeout = self.context_manager.seconds_until_next_expiry()
+                    if timeout is None or timeout > Config.PROCESSING_LOOP_MAX_WAIT:
+                        timeout = Config.PROCESSING_LOOP_MAX_WAIT
+                    
+                    command = self.voice_handler.wait_for_command(timeout)
+                    if command:
+                        self.process_command(command, source="voice")
                     
-                    # Cleanup expired context periodically
+                    # Evict context that has come due
                     self.context_manager.cleanup_expired_context()
                     
-                    time.sleep(0.1)  # Small delay to prevent high CPU usage
+                    # Downsample old emotion history into its rollups
+                    if time.monotonic() - last_compaction >= Config.EMOTION_COMPACTION_INTERVAL:
+                        self.memory_manager.compact_emotion_history()
+                        last_compaction = time.monotonic()
                     
                 except Exception as e:
                     print(f"Error in processing loop: {e}")
@@ -171,12 +210,16 @@ class EricAIAssistant:
     def process_command(self, command: str, source: str = "text") -> dict:
         """Process a command and return response."""
         try:
+            # Tokenize and vectorize once for both classifiers
+            features = self.featurizer.transform([command]) if self.featurizer else None
+            
             # Detect emotion from text
-            emotion, emotion_confidence = self.emotion_detector.detect_text_emotion(command)
+            emotion, emotion_confidence = self.emotion_detector.detect_text_emotion(command, features)
             self.memory_manager.store_emotion(emotion, emotion_confidence, command)
             
             # Get intent and confidence
-            intent, intent_confidence = self.nlp_model.predict_intent(command)
+            # Known phrases resolve without the classifier
+            intent, intent_confidence = self.intent_router.predict_intent(command, features)
             
             # Extract entities
             entities = self.nlp_model.extract_entities(command, intent)
@@ -228,12 +271,7 @@ class EricAIAssistant:
         
         elif intent == "remember_fact":
             # Extract the fact to remember
-            fact_markers = ["remember that", "remember", "don't forget", "save this"]
-            fact = command
-            for marker in fact_markers:
-                if marker in command.lower():
-                    fact = command.lower().split(marker, 1)[1].strip()
-                    break
+            fact = entities.get('fact', command)
             
             if fact:
                 success = self.memory_manager.store_memory(
@@ -298,13 +336,14 @@ class EricAIAssistant:
         
         elif intent == "play_music":
             # Music control
-            if "next" in command or "skip" in command:
+            action = entities.get('action')
+            if action == "next":
                 return "Skipping to the next song."
-            elif "previous" in command or "back" in command:
+            elif action == "previous":
                 return "Going back to the previous song."
-            elif "pause" in command:
+            elif action == "pause":
                 return "Pausing music."
-            elif "stop" in command:
+            elif action == "stop":
                 return "Stopping music."
             else:
                 query = entities.get('query', 'your favorite playlist')
@@ -370,23 +409,14 @@ def stop_voice_listening():
     eric.is_listening = False
     return {"status": "Voice listening stopped"}
 
-@eel.expose
-def authenticate_with_face(image_data):
-    """Authenticate user with face recognition."""
+def authenticate_frame(image_data) -> dict:
+    """Authenticate from an encoded camera frame: a data URL or raw JPEG bytes."""
     try:
-        # Decode base64 image
-        import base64
-        import numpy as np
-        
-        image_data = image_data.split(',')[1]  # Remove data:image/jpeg;base64,
-        image_bytes = base64.b64decode(image_data)
-        
-        # Convert to cv2 image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decoded in memory, straight to the RGB the face models take
+        frame = decode_image(image_data, reduction=Config.FACE_DECODE_REDUCTION)
         
         # Authenticate
-        name, confidence, face_locations = eric.face_recognition.authenticate_face(frame)
+        name, confidence, face_locations = eric.face_recognition.authenticate_face(frame, rgb=True)
         
         if confidence > 0.7:
             eric.is_authenticated = True
@@ -409,32 +439,96 @@ def authenticate_with_face(image_data):
         }
 
 @eel.expose
-def register_face(image_data, user_name):
-    """Register a new face."""
+def authenticate_with_face(image_data):
+    """Authenticate user with face recognition."""
+    return authenticate_frame(image_data)
+
+# Frame bodies stay in memory; bottle spools larger ones to a temporary file
+eel.btl.BaseRequest.MEMFILE_MAX = max(eel.btl.BaseRequest.MEMFILE_MAX, Config.FACE_STREAM_MAX_BYTES)
+
+def _from_app_origin(request) -> bool:
+    """Whether a request comes from the Eel window's own page on this machine."""
+    # A page on another site, or one reaching us through DNS rebinding, can
+    # post here too; only the app's own origin is let through
+    own_origin = f"{request.urlparts.scheme}://{request.urlparts.netloc}"
+    return (request.get_header('Origin') == own_origin
+            and request.urlparts.hostname in ('localhost', '127.0.0.1'))
+
+def _reject_frame(status: int, message: str) -> dict:
+    """Set an error status for a frame upload and explain it."""
+    eel.btl.response.status = status
+    return {"authenticated": False, "message": message}
+
+@eel.btl.route('/frames/authenticate', method='POST')
+def authenticate_frame_upload():
+    """Authenticate from a binary JPEG frame posted by the camera stream, no base64."""
+    request = eel.btl.request
+    if not _from_app_origin(request):
+        return _reject_frame(403, "Forbidden origin")
+    if request.content_type != 'image/jpeg':
+        return _reject_frame(415, "Frames must be image/jpeg")
+    # The camera posts a Blob, which always has a length; chunked bodies are refused
+    if request.content_length < 0:
+        return _reject_frame(411, "Content-Length required")
+    if request.content_length > Config.FACE_STREAM_MAX_BYTES:
+        return _reject_frame(413, "Frame too large")
+
+    # The limit holds for the bytes actually received, whatever the header said
+    if hasattr(request.body, 'getbuffer'):
+        image_data = request.body.getbuffer()
+    else:
+        image_data = request.body.read(Config.FACE_STREAM_MAX_BYTES + 1)
+    if len(image_data) > Config.FACE_STREAM_MAX_BYTES:
+        return _reject_frame(413, "Frame too large")
+    return authenticate_frame(image_data)
+
+@eel.expose
+def get_camera_config():
+    """How the camera should capture and send frames for authentication."""
+    return {
+        "transport": Config.FACE_STREAM_TRANSPORT,
+        "endpoint": "/frames/authenticate",
+        "width": Config.FACE_STREAM_WIDTH,
+        "fps": Config.FACE_STREAM_FPS,
+        "quality": Config.FACE_STREAM_JPEG_QUALITY
+    }
+
+@eel.expose
+def register_face(image_data, user_name, replace_existing=False):
+    """Register a new face; `replace_existing` re-enrolls the user from this image alone."""
     try:
-        # Save image temporarily
-        import tempfile
-        import base64
-        
-        image_data = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-            temp_file.write(image_bytes)
-            temp_path = temp_file.name
+        # Full resolution: the enrolled encoding is matched against for as long as it is kept
+        image = decode_image(image_data)
         
         # Register face
-        success = eric.face_recognition.register_face(temp_path, user_name)
-        
-        # Clean up temp file
-        import os
-        os.unlink(temp_path)
+        success = eric.face_recognition.register_face(image, user_name, replace_existing)
         
         return {"success": success}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@eel.expose
+def delete_face(user_name):
+    """Forget every face registered for a user."""
+    try:
+        return {"success": eric.face_recognition.delete_user(user_name)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@eel.expose
+def teach_intent(text, intent):
+    """Teach Eric that an utterance means an intent (new intents allowed)."""
+    return {"success": eric.intent_router.learn_examples([text], [intent])}
+
+@eel.expose
+def correct_last_intent(intent):
+    """Correct the intent Eric picked for the last command."""
+    history = eric.context_manager.get_conversation_context(turns_back=1)
+    if not history:
+        return {"success": False, "error": "No command to correct"}
+    return {"success": eric.intent_router.learn_examples([history[-1]['user_input']], [intent])}
+
 @eel.expose
 def get_conversation_history():
     """Get recent conversation history."""
@@ -450,6 +544,31 @@ def get_emotion_pattern():
     """Get emotion pattern."""
     return eric.memory_manager.get_emotion_pattern()
 
+@eel.expose
+def get_memory_page(before_id=None, limit=50, memory_type=None):
+    """Page through stored memories, newest first."""
+    return eric.memory_manager.get_memory_page(memory_type, before_id, limit)
+
+@eel.expose
+def get_events_page(after=None, limit=50, days_ahead=7):
+    """Page through upcoming events in date order."""
+    return eric.memory_manager.get_events_page(days_ahead, after, limit)
+
+@eel.expose
+def get_emotion_history_page(before_id=None, limit=50):
+    """Page through raw emotion history, newest first."""
+    return eric.memory_manager.get_emotion_history_page(before_id, limit)
+
+@eel.expose
+def get_cache_stats():
+    """Hit rates of the memory and prediction caches and of the intent router stages."""
+    return {
+        'memory': eric.memory_manager.cache_stats(),
+        'intent': eric.nlp_model.cache_stats(),
+        'intent_router': eric.intent_router.stats(),
+        'emotion': eric.emotion_detector.cache_stats()
+    }
+
 def main():
     """Main function to start the application."""
     # Initialize Eel
@@ -459,7 +578,10 @@ def main():
     eric.start()
     
     # Start the web interface
-    eel.start('index.html', size=(1200, 800), port=8080)
+    try:
+        eel.start('index.html', size=(1200, 800), port=8080)
+    finally:
+        eric.shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Benchmarks behind the performance numbers quoted in the commit history.
+
+Run from backend/, e.g. ``python -m benchmarks.connection_pool``. Every
+benchmark works in a temporary directory, never on the app's own data.
+"""
+import ast
+import importlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+_BACKEND = Path(__file__).resolve().parent.parent
+# models/__init__.py imports its modules by bare name
+sys.path[:0] = [str(_BACKEND), str(_BACKEND / "models")]
+
+try:
+    from config import Config
+except ModuleNotFoundError:
+    # Backend modules import Config.py as `config`, which only resolves on
+    # case-insensitive filesystems
+    sys.modules['config'] = importlib.import_module('Config')
+    from config import Config
+
+def use_temp_data() -> Path:
+    """Point the database, model and index paths at a fresh temporary directory."""
+    root = Path(tempfile.mkdtemp(prefix="eric-bench-"))
+    models = root / "models"
+    Config.DATABASE_PATH = root / "eric_memory.db"
+    Config.VECTOR_INDEX_DIR = root / "vector_index"
+    Config.MODEL_DIR = models
+    for name in ('NLP_MODEL_PATH', 'EMOTION_MODEL_PATH', 'EMOTION_LINEAR_MODEL_PATH',
+                 'FACE_ENCODINGS_PATH', 'LEMMA_TABLE_PATH', 'SHARED_FEATURES_PATH',
+                 'ONLINE_INTENT_MODEL_PATH', 'INTENT_JOURNAL_PATH'):
+        setattr(Config, name, models / getattr(Config, name).name)
+    os.makedirs(models)
+    return root
+
+def training_corpora(source: Path = None) -> Tuple[dict, dict]:
+    """The intent_data and emotion_data literals of a training script (default: training/train_nlp_model.py)."""
+    source = source or _BACKEND.parent / "training" / "train_nlp_model.py"
+    corpora = {}
+    for node in ast.walk(ast.parse(Path(source).read_text())):
+        if (isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id in ('intent_data', 'emotion_data')):
+            corpora[node.targets[0].id] = ast.literal_eval(node.value)
+    return corpora['intent_data'], corpora['emotion_data']
+
+def labelled(data: dict) -> Tuple[list, list]:
+    """(texts, labels) of an {"intents": ...} or {"emotions": ...} corpus."""
+    texts, labels = [], []
+    for label, examples in next(iter(data.values())).items():
+        texts.extend(examples)
+        labels.extend([label] * len(examples))
+    return texts, labels
+
+def per_call(function, repeat: int) -> float:
+    """Mean seconds per call of `function` over `repeat` calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
@@ -0,0 +1,65 @@
+"""Pooled connections against opening a connection per call (user-001).
+
+Times the by-type memory lookup and the emotion insert both ways on a
+database of 2,000 memories, then checks that connections of exited
+threads are closed.
+"""
+import gc
+import sqlite3
+import threading
+from benchmarks import Config, per_call, use_temp_data
+from database import queries
+from database.connection_pool import get_pool
+from database.init_db import initialize_database
+
+MEMORIES = 2000
+INSERT_EMOTION = "INSERT INTO emotion_history (user_id, emotion, confidence, text_input) VALUES (?, ?, ?, ?)"
+
+def lookup(conn: sqlite3.Connection):
+    conn.execute(queries.MEMORIES_BY_TYPE_BY_RANK, ("default_user", "fact", 3)).fetchall()
+
+def insert(conn: sqlite3.Connection):
+    with conn:
+        conn.execute(INSERT_EMOTION, ("default_user", "joy", 0.5, "benchmark"))
+
+def per_call_connection(operation):
+    """The previous pattern: connect, run, commit and close every time."""
+    def run():
+        conn = sqlite3.connect(Config.DATABASE_PATH)
+        try:
+            operation(conn)
+        finally:
+            conn.close()
+    return run
+
+def main():
+    use_temp_data()
+    initialize_database()
+    pool = get_pool(Config.DATABASE_PATH)
+    with pool.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO memory (user_id, memory_type, content) VALUES ('default_user', 'fact', ?)",
+            [(f"fact number {i} about cats",) for i in range(MEMORIES)]
+        )
+
+    for label, operation, repeat in (("lookup", lookup, 3000), ("insert", insert, 500)):
+        unpooled = per_call(per_call_connection(operation), repeat)
+        pooled = per_call(lambda: operation(pool.get_connection()), repeat)
+        print(f"{label}: {1 / unpooled:8.0f}/s per-call connection, {1 / pooled:8.0f}/s pooled")
+
+    def write_once():
+        insert(pool.get_connection())
+
+    for _ in range(5):
+        threads = [threading.Thread(target=write_once) for _ in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    gc.collect()
+    print(f"open connections after 200 short-lived threads: {pool.size()}")
+    pool.close_all()
+    print(f"open connections after close_all: {pool.size()}")
+
+if __name__ == "__main__":
+    main()
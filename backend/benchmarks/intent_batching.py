@@ -0,0 +1,46 @@
+"""Batched intent inference against a predict plus predict_proba per utterance (user-011).
+
+Trains NLPModel on the intent corpus of training/train_nlp_model.py and
+times the old two-pass path per utterance, then predict_intents on
+batches of 1, 32 and 1024 with the prediction cache cleared each time.
+"""
+import contextlib
+import io
+from benchmarks import labelled, per_call, training_corpora, use_temp_data
+from models.nlp_model import NLPModel
+
+def main():
+    use_temp_data()
+    intent_data, _ = training_corpora()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = NLPModel()
+        model.train_model(intent_data)
+
+    texts = [f"{phrase} number {i}" for i, phrase in enumerate(labelled(intent_data)[0] * 8)][:1024]
+
+    def two_pass(text):
+        processed = [model.preprocess_text(text)]
+        intent = model.pipeline.predict(processed)[0]
+        confidence = max(model.pipeline.predict_proba(processed)[0])
+        return intent, confidence
+
+    position = iter(range(10 ** 9))
+    old = per_call(lambda: two_pass(texts[next(position) % len(texts)]), 300)
+    print(f"predict + predict_proba per utterance: {old * 1e6:8.1f} us/utterance")
+
+    for batch_size in (1, 32, 1024):
+        batch = texts[:batch_size]
+
+        def run():
+            model.prediction_cache.clear()
+            model.predict_intents(batch)
+        seconds = per_call(run, max(1, 300 // batch_size))
+        print(f"predict_intents, batch of {batch_size:4d}:     {seconds / batch_size * 1e6:8.1f} us/utterance")
+
+    assert [two_pass(text)[0] for text in texts[:100]] == [
+        intent for intent, _, _ in model.predict_intents(texts[:100])
+    ]
+    print("labels identical to the two-pass path")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""NLTK-free preprocessing against the word_tokenize + WordNetLemmatizer pipeline (user-012).
+
+Times both over every intent and emotion phrase of the app and the
+training script. Parts of the old pipeline whose NLTK data is missing
+are replaced by their closest data-free equivalent, and said so, so the
+comparison still runs (and understates the old cost) on bare machines.
+"""
+import re
+import time
+import nltk
+from benchmarks import Config, labelled, training_corpora, use_temp_data
+from utils import text_processing
+
+def nltk_pipeline():
+    """The old preprocess_text, built from whatever NLTK data is installed."""
+    from nltk.tokenize import NLTKWordTokenizer, word_tokenize
+
+    notes = []
+    tokenize = word_tokenize
+    try:
+        word_tokenize("probe")
+    except LookupError:
+        tokenize = NLTKWordTokenizer().tokenize
+        notes.append("Treebank tokenizer without Punkt sentence splitting")
+    try:
+        from nltk.corpus import stopwords
+        stop_words = set(stopwords.words('english'))
+    except LookupError:
+        stop_words = set(text_processing.STOP_WORDS)
+        notes.append("built-in stopword list")
+    try:
+        nltk.data.find('corpora/wordnet')
+        from nltk.stem import WordNetLemmatizer
+        lemmatize = WordNetLemmatizer().lemmatize
+    except LookupError:
+        lemmatize = None
+        notes.append("no lemmatizer")
+
+    def preprocess(text):
+        text = re.sub(r'[^a-zA-Z\s]', '', text.lower())
+        tokens = [token for token in tokenize(text) if token not in stop_words]
+        return ' '.join(lemmatize(token) for token in tokens) if lemmatize else ' '.join(tokens)
+    return preprocess, notes
+
+def main():
+    use_temp_data()
+    phrases = []
+    for source in (Config.BACKEND_DIR / "app.py", None):
+        for data in training_corpora(source):
+            phrases.extend(labelled(data)[0])
+
+    old, notes = nltk_pipeline()
+    if notes:
+        print(f"old pipeline without its missing NLTK data: {', '.join(notes)}")
+    # Build (or load) the lemma table before timing
+    text_processing.get_lemma_table()
+
+    for _ in range(3):
+        for phrase in phrases:
+            old(phrase)
+            text_processing.preprocess(phrase)
+
+    timings = {}
+    for label, function in (("nltk", old), ("preprocess", text_processing.preprocess)):
+        start = time.perf_counter()
+        for _ in range(20):
+            for phrase in phrases:
+                function(phrase)
+        timings[label] = (time.perf_counter() - start) / (20 * len(phrases))
+        print(f"{label:>10}: {timings[label] * 1e6:6.1f} us/phrase over {len(phrases)} phrases")
+    print(f"speedup: {timings['nltk'] / timings['preprocess']:.1f}x")
+
+if __name__ == "__main__":
+    main()
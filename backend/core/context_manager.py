@@ -1,6 +1,11 @@
 import json
 import datetime
+import heapq
+import threading
+import time
 from typing import Dict, List, Any, Optional
+from config import Config
+from database import queries
 from core.memory_manager import MemoryManager
 
 class ContextManager:
@@ -10,41 +15,58 @@ class ContextManager:
         self.conversation_history = []
         self.max_history_length = 50
         
+        # Min-heap of (expires_at, key); entries for overwritten keys go stale
+        # and are skipped when popped.
+        self._expiry_heap = []
+        self._expiry_lock = threading.Lock()
+        self._db_cleanup_pending = True
+        self._last_db_cleanup = 0.0
+        
     def set_context(self, key: str, value: Any, expires_minutes: int = 60):
         """Set context with expiration."""
+        self.set_contexts({key: value}, expires_minutes)
+    
+    def set_contexts(self, contexts: Dict[str, Any], expires_minutes: int = 60):
+        """Set several context keys with one expiration, in a single transaction."""
         expires_at = datetime.datetime.now() + datetime.timedelta(minutes=expires_minutes)
         
-        self.current_context[key] = {
-            'value': value,
-            'expires_at': expires_at,
-            'created_at': datetime.datetime.now()
-        }
+        with self._expiry_lock:
+            for key, value in contexts.items():
+                self.current_context[key] = {
+                    'value': value,
+                    'expires_at': expires_at,
+                    'created_at': datetime.datetime.now()
+                }
+                heapq.heappush(self._expiry_heap, (expires_at, key))
+            
+            # Frequent re-sets of the same keys leave stale heap entries behind
+            if len(self._expiry_heap) > 2 * len(self.current_context) + 64:
+                self._expiry_heap = [(item['expires_at'], context_key)
+                                     for context_key, item in self.current_context.items()]
+                heapq.heapify(self._expiry_heap)
         
         # Store in database for persistence
-        context_data = {
-            'key': key,
-            'value': value,
-            'expires_at': expires_at.isoformat()
-        }
+        rows = []
+        for key, value in contexts.items():
+            context_data = {
+                'key': key,
+                'value': value,
+                'expires_at': expires_at.isoformat()
+            }
+            rows.append((self.memory_manager.user_id, key, json.dumps(context_data), expires_at))
         
         try:
             conn = self.memory_manager._get_connection()
-            cursor = conn.cursor()
-            
-            # Remove existing context with same key
-            cursor.execute("""
-                DELETE FROM conversation_context 
-                WHERE user_id = ? AND JSON_EXTRACT(context_data, '$.key') = ?
-            """, (self.memory_manager.user_id, key))
-            
-            # Insert new context
-            cursor.execute("""
-                INSERT INTO conversation_context (user_id, context_data, expires_at)
-                VALUES (?, ?, ?)
-            """, (self.memory_manager.user_id, json.dumps(context_data), expires_at))
-            
-            conn.commit()
-            conn.close()
+            with conn:
+                # Replace any existing value for the key in place
+                conn.executemany("""
+                    INSERT INTO conversation_context (user_id, context_key, context_data, expires_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id, context_key) DO UPDATE SET
+                        context_data = excluded.context_data,
+                        expires_at = excluded.expires_at,
+                        created_at = CURRENT_TIMESTAMP
+                """, rows)
         except Exception as e:
             print(f"Error storing context: {e}")
     
@@ -56,7 +78,8 @@ class ContextManager:
                 return context_item['value']
             else:
                 # Remove expired context
-                del self.current_context[key]
+                self.current_context.pop(key, None)
+                self._db_cleanup_pending = True
         
         return None
     
@@ -66,11 +89,12 @@ class ContextManager:
     
     def clear_context(self, key: str = None):
         """Clear specific context or all context."""
-        if key:
-            if key in self.current_context:
-                del self.current_context[key]
-        else:
-            self.current_context.clear()
+        with self._expiry_lock:
+            if key:
+                self.current_context.pop(key, None)
+            else:
+                self.current_context.clear()
+                self._expiry_heap.clear()
     
     def add_to_conversation(self, user_input: str, bot_response: str, intent: str = None):
         """Add conversation turn to history."""
@@ -105,47 +129,61 @@ class ContextManager:
             conn = self.memory_manager._get_connection()
             cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT context_data FROM conversation_context 
-                WHERE user_id = ? AND expires_at > datetime('now')
-            """, (self.memory_manager.user_id,))
+            cursor.execute(queries.UNEXPIRED_CONTEXT, (self.memory_manager.user_id,))
             
             rows = cursor.fetchall()
-            for row in rows:
-                context_data = json.loads(row[0])
-                self.current_context[context_data['key']] = {
-                    'value': context_data['value'],
-                    'expires_at': datetime.datetime.fromisoformat(context_data['expires_at']),
-                    'created_at': datetime.datetime.now()
-                }
+            with self._expiry_lock:
+                for row in rows:
+                    context_data = json.loads(row[0])
+                    expires_at = datetime.datetime.fromisoformat(context_data['expires_at'])
+                    self.current_context[context_data['key']] = {
+                        'value': context_data['value'],
+                        'expires_at': expires_at,
+                        'created_at': datetime.datetime.now()
+                    }
+                    heapq.heappush(self._expiry_heap, (expires_at, context_data['key']))
             
-            conn.close()
+            cursor.close()
         except Exception as e:
             print(f"Error loading context from database: {e}")
     
+    def seconds_until_next_expiry(self) -> Optional[float]:
+        """Seconds until the earliest context item expires, or None if there is none."""
+        with self._expiry_lock:
+            if not self._expiry_heap:
+                return None
+            remaining = (self._expiry_heap[0][0] - datetime.datetime.now()).total_seconds()
+            return max(remaining, 0.0)
+    
     def cleanup_expired_context(self):
-        """Remove expired context items."""
+        """Remove expired context items.
+        
+        Only keys whose expiry has come up are touched. The database delete is
+        batched and runs at most once per CONTEXT_DB_CLEANUP_INTERVAL, and only
+        after something has actually expired.
+        """
         current_time = datetime.datetime.now()
-        expired_keys = []
         
-        for key, context_item in self.current_context.items():
-            if current_time >= context_item['expires_at']:
-                expired_keys.append(key)
+        with self._expiry_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= current_time:
+                expires_at, key = heapq.heappop(self._expiry_heap)
+                context_item = self.current_context.get(key)
+                # Skip heap entries left behind by a later set_context
+                if context_item is not None and context_item['expires_at'] == expires_at:
+                    del self.current_context[key]
+                    self._db_cleanup_pending = True
         
-        for key in expired_keys:
-            del self.current_context[key]
+        if not self._db_cleanup_pending:
+            return
+        if time.monotonic() - self._last_db_cleanup < Config.CONTEXT_DB_CLEANUP_INTERVAL:
+            return
         
         # Cleanup database
         try:
             conn = self.memory_manager._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                DELETE FROM conversation_context 
-                WHERE user_id = ? AND expires_at <= datetime('now')
-            """, (self.memory_manager.user_id,))
-            
-            conn.commit()
-            conn.close()
+            with conn:
+                conn.execute(queries.DELETE_EXPIRED_CONTEXT, (self.memory_manager.user_id,))
+            self._db_cleanup_pending = False
+            self._last_db_cleanup = time.monotonic()
         except Exception as e:
             print(f"Error cleaning up expired context: {e}")
\ No newline at end of file
@@ -0,0 +1,84 @@
+from typing import Iterable, List, Tuple
+import numpy as np
+from config import Config
+from database.connection_pool import get_pool
+
+ENCODING_SIZE = 128
+_ENCODING_DTYPE = np.dtype('<f4')
+
+class FaceEncodingStore:
+    """Face encodings in SQLite, one append-only row per enrollment.
+
+    Enrolling inserts a single row, so its cost does not depend on how many
+    faces are stored, and concurrent enrollments are ordinary transactions
+    that SQLite serializes instead of rewrites of one file that can lose
+    each other. A user may have any number of rows.
+    """
+
+    def __init__(self, db_path=None):
+        self.pool = get_pool(db_path or Config.DATABASE_PATH)
+
+    @staticmethod
+    def to_blob(encoding: np.ndarray) -> bytes:
+        """Fixed little-endian float32 bytes of one encoding."""
+        encoding = np.asarray(encoding, dtype=_ENCODING_DTYPE).reshape(-1)
+        if len(encoding) != ENCODING_SIZE:
+            raise ValueError(f"Face encodings have {ENCODING_SIZE} values, got {len(encoding)}")
+        return encoding.tobytes()
+
+    def add(self, user_id: str, encodings: Iterable[np.ndarray], replace: bool = False) -> List[int]:
+        """Append encodings for a user, first dropping their old ones if `replace`; returns row ids."""
+        blobs = [self.to_blob(encoding) for encoding in encodings]
+        conn = self.pool.get_connection()
+        with conn:
+            # Re-enrollment is one transaction: never a moment with no encodings
+            if replace:
+                conn.execute("DELETE FROM face_encodings WHERE user_id = ?", (user_id,))
+            # Registered names become users, so foreign keys hold
+            conn.execute("""
+                INSERT OR IGNORE INTO users (user_id, name, preferences) VALUES (?, ?, '{}')
+            """, (user_id, user_id))
+            return [conn.execute("""
+                INSERT INTO face_encodings (user_id, encoding) VALUES (?, ?)
+            """, (user_id, blob)).lastrowid for blob in blobs]
+
+    def delete_user(self, user_id: str) -> int:
+        """Remove every encoding of a user; returns how many were removed."""
+        conn = self.pool.get_connection()
+        with conn:
+            return conn.execute(
+                "DELETE FROM face_encodings WHERE user_id = ?", (user_id,)
+            ).rowcount
+
+    def count(self) -> int:
+        """Number of stored encodings."""
+        conn = self.pool.get_connection()
+        return conn.execute("SELECT COUNT(*) FROM face_encodings").fetchone()[0]
+
+    def load(self) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """(row ids, user ids, N x 128 float32 encodings) from one query, in enrollment order."""
+        conn = self.pool.get_connection()
+        rows = conn.execute(
+            "SELECT id, user_id, encoding FROM face_encodings ORDER BY id"
+        ).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), [], np.empty((0, ENCODING_SIZE), dtype=np.float32)
+
+        ids, user_ids, blobs = zip(*rows)
+        # One join and one frombuffer rather than a conversion per row
+        encodings = np.frombuffer(b''.join(blobs), dtype=_ENCODING_DTYPE)
+        return (np.array(ids, dtype=np.int64), list(user_ids),
+                encodings.reshape(-1, ENCODING_SIZE).astype(np.float32))
+
+    def import_encodings(self, encodings: np.ndarray, user_ids: List[str]) -> int:
+        """Bulk-insert encodings kept elsewhere (legacy files) in one transaction."""
+        rows = [(user_id, self.to_blob(encoding)) for encoding, user_id in zip(encodings, user_ids)]
+        conn = self.pool.get_connection()
+        with conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO users (user_id, name, preferences) VALUES (?, ?, '{}')
+            """, [(user_id, user_id) for user_id in set(user_ids)])
+            conn.executemany(
+                "INSERT INTO face_encodings (user_id, encoding) VALUES (?, ?)", rows
+            )
+        return len(rows)
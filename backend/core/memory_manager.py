@@ -1,105 +1,366 @@
-import sqlite3
 import json
 import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, NamedTuple
 from config import Config
-import pickle
+from database import queries
+from database.connection_pool import get_pool
+from core.write_behind import WriteBehindQueue
+from core.vector_index import VectorIndex, get_encoder, index_directory
+from utils.cache import LRUCache, MISSING
+import re
+import threading
+from functools import partial
+from itertools import islice
+
+# Largest SQLite integer: the "before the first page" keyset token
+_MAX_ROW_ID = 2 ** 63 - 1
+
+class MemoryRecord(NamedTuple):
+    id: int
+    user_id: str
+    memory_type: str
+    content: str
+    keywords: list
+    timestamp: str
+    importance_score: float
+    context_tags: list
+    
+    @classmethod
+    def from_row(cls, row: tuple) -> 'MemoryRecord':
+        return cls(row[0], row[1], row[2], row[3],
+                   json.loads(row[4]) if row[4] else [],
+                   row[5], row[6],
+                   json.loads(row[7]) if row[7] else [])
+
+class EventRecord(NamedTuple):
+    id: int
+    title: str
+    description: str
+    event_date: str
+    reminder_date: str
+    is_completed: bool
+
+class EmotionRecord(NamedTuple):
+    id: int
+    emotion: str
+    confidence: float
+    text_input: str
+    timestamp: str
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Function words and command verbs that would otherwise match nearly every
+# stored memory
+_SEARCH_STOP_WORDS = frozenset([
+    'a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'did', 'do', 'does',
+    'for', 'from', 'how', 'i', 'in', 'is', 'it', 'know', 'me', 'my', 'of',
+    'on', 'or', 'recall', 'remember', 'tell', 'that', 'the', 'this', 'to',
+    'was', 'what', 'when', 'where', 'who', 'why', 'you', 'your'
+])
 
 class MemoryManager:
-    def __init__(self, user_id: str = "default_user"):
+    def __init__(self, user_id: str = "default_user", write_behind: bool = None):
         self.user_id = user_id
         self.db_path = Config.DATABASE_PATH
+        self.pool = get_pool(self.db_path)
+        
+        # Optionally move emotion/memory inserts off the request path
+        if write_behind is None:
+            write_behind = Config.WRITE_BEHIND_ENABLED
+        self.write_queue = WriteBehindQueue(self.pool) if write_behind else None
+        if self.write_queue:
+            self.write_queue.start()
+        
+        # Semantic index is opened on first use
+        self._vector_index = None
+        self._vector_lock = threading.Lock()
+        
+        # Read-through cache for retrieve_memories, keyed by
+        # (user_id, query, memory_type, limit)
+        self.memory_cache = LRUCache(Config.MEMORY_CACHE_SIZE, Config.MEMORY_CACHE_TTL)
     
     def _get_connection(self):
-        """Get database connection."""
-        return sqlite3.connect(self.db_path)
+        """Get this thread's pooled database connection."""
+        return self.pool.get_connection()
+    
+    def _execute_write(self, sql: str, params: tuple, on_commit=None) -> bool:
+        """Queue an insert for group commit, or write it directly.
+        
+        Returns True if the write was queued rather than committed. A queued
+        write calls `on_commit` when its batch commits; a direct one leaves
+        that to the caller.
+        """
+        if self.write_queue and self.write_queue.submit(self.user_id, sql, params, on_commit):
+            return True
+        
+        conn = self._get_connection()
+        with conn:
+            conn.execute(sql, params)
+        return False
+    
+    def _await_pending_writes(self):
+        """Make this user's queued writes visible before reading."""
+        if self.write_queue:
+            # Bounded: a stuck writer delays reads instead of hanging them
+            if not self.write_queue.wait_for(self.user_id, timeout=Config.WRITE_BEHIND_WAIT_TIMEOUT):
+                print("Timed out waiting for queued writes; reading without them.")
+    
+    def _invalidate_memory_cache(self, memory_type: str = None):
+        """Drop cached lookups that a change to this memory type could affect."""
+        self.memory_cache.invalidate(
+            lambda key: key[0] == self.user_id and (
+                memory_type is None or key[2] is None or key[2] == memory_type
+            )
+        )
+    
+    def cache_stats(self) -> dict:
+        """Hit/miss/eviction counters for the memory read cache."""
+        return self.memory_cache.stats()
+    
+    def close(self):
+        """Flush queued writes and close pooled connections on shutdown."""
+        if self.write_queue:
+            self.write_queue.stop()
+        self.pool.close_all()
     
     def store_memory(self, content: str, memory_type: str = "fact", 
                     keywords: List[str] = None, importance_score: float = 1.0,
                     context_tags: List[str] = None) -> bool:
         """Store a memory in the database."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
             keywords_json = json.dumps(keywords) if keywords else "[]"
             context_tags_json = json.dumps(context_tags) if context_tags else "[]"
             
-            cursor.execute("""
+            committed = partial(self._memory_committed, memory_type)
+            queued = self._execute_write("""
                 INSERT INTO memory (user_id, memory_type, content, keywords, 
                                   importance_score, context_tags)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (self.user_id, memory_type, content, keywords_json, 
-                  importance_score, context_tags_json))
+                  importance_score, context_tags_json), on_commit=committed)
             
-            conn.commit()
-            conn.close()
-            return True
+            if queued:
+                # Lookups wait for the queued row, so they must miss the cache
+                # now; its commit invalidates again, so a lookup racing the
+                # commit cannot cache a result missing it
+                self._invalidate_memory_cache(memory_type)
+            else:
+                committed()
         except Exception as e:
             print(f"Error storing memory: {e}")
             return False
+        return True
     
-    def retrieve_memories(self, query: str = None, memory_type: str = None,
-                         limit: int = 10) -> List[Dict[str, Any]]:
-        """Retrieve memories based on query or type."""
+    def _memory_committed(self, memory_type: str):
+        """Embed newly committed memories and drop the cached lookups they change."""
+        self.sync_semantic_index()
+        self._invalidate_memory_cache(memory_type)
+    
+    def delete_memory(self, memory_id: int) -> bool:
+        """Delete one of this user's memories."""
         try:
+            self._await_pending_writes()
             conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            sql = "SELECT * FROM memory WHERE user_id = ?"
-            params = [self.user_id]
+            with conn:
+                row = conn.execute("""
+                    SELECT memory_type FROM memory WHERE id = ? AND user_id = ?
+                """, (memory_id, self.user_id)).fetchone()
+                if row is None:
+                    return False
+                conn.execute("DELETE FROM memory WHERE id = ?", (memory_id,))
             
-            if memory_type:
-                sql += " AND memory_type = ?"
-                params.append(memory_type)
+            # The vector index keeps the row; lookups skip ids no longer in memory
+            self._invalidate_memory_cache(row[0])
+            return True
+        except Exception as e:
+            print(f"Error deleting memory: {e}")
+            return False
+    
+    def _row_to_memory(self, row: tuple) -> Dict[str, Any]:
+        """Convert a memory row into the dict returned to callers."""
+        return MemoryRecord.from_row(row)._asdict()
+    
+    def _iter_keyset(self, sql: str, params: list, token: Any, chunk_size: int,
+                     make_record) -> Iterator[Any]:
+        """Run a keyset-paginated query chunk by chunk.
+        
+        `sql` ends with a placeholder for the continuation token and one for
+        the chunk size. No cursor stays open between chunks, so a slow consumer
+        never holds a read transaction.
+        """
+        while True:
+            cursor = self._get_connection().execute(sql, params + [token, chunk_size])
+            rows = cursor.fetchall()
+            cursor.close()
             
-            if query:
-                sql += " AND (content LIKE ? OR keywords LIKE ?)"
-                query_param = f"%{query}%"
-                params.extend([query_param, query_param])
+            for row in rows:
+                yield make_record(row)
+            if len(rows) < chunk_size:
+                return
+            token = rows[-1][0]
+    
+    def iter_memories(self, memory_type: str = None, before_id: int = None,
+                      chunk_size: int = None) -> Iterator[MemoryRecord]:
+        """Stream this user's memories, newest first."""
+        self._await_pending_writes()
+        if memory_type:
+            sql, params = queries.MEMORIES_BY_TYPE_BEFORE_ID, [self.user_id, memory_type]
+        else:
+            sql, params = queries.MEMORIES_BEFORE_ID, [self.user_id]
+        yield from self._iter_keyset(sql, params, before_id or _MAX_ROW_ID,
+                                     chunk_size or Config.STREAM_CHUNK_SIZE,
+                                     MemoryRecord.from_row)
+    
+    def get_memory_page(self, memory_type: str = None, before_id: int = None,
+                        limit: int = 50) -> Dict[str, Any]:
+        """One page of memories plus the token for the next page."""
+        try:
+            memories = [memory._asdict() for memory in
+                        islice(self.iter_memories(memory_type, before_id, limit), limit)]
+            next_before_id = memories[-1]['id'] if len(memories) == limit else None
+            return {'items': memories, 'next_before_id': next_before_id}
+        except Exception as e:
+            print(f"Error paging memories: {e}")
+            return {'items': [], 'next_before_id': None}
+    
+    def _get_vector_index(self) -> VectorIndex:
+        """Open this user's semantic index."""
+        if self._vector_index is None:
+            self._vector_index = VectorIndex(index_directory(Config.VECTOR_INDEX_DIR, self.user_id),
+                                             get_encoder())
+        return self._vector_index
+    
+    def sync_semantic_index(self):
+        """Embed memories committed since the semantic index was last updated.
+        
+        store_memory calls this as each memory commits; at startup it catches
+        up on memories stored while the app was not running.
+        """
+        try:
+            with self._vector_lock:
+                index = self._get_vector_index()
+                cursor = self._get_connection().execute(queries.MEMORIES_AFTER_ID,
+                                                        (self.user_id, index.max_id))
+                
+                while True:
+                    rows = cursor.fetchmany(Config.VECTOR_SYNC_BATCH_SIZE)
+                    if not rows:
+                        break
+                    index.add([row[0] for row in rows],
+                              [f"{row[1]} {row[2] or ''}" for row in rows])
+                cursor.close()
+        except Exception as e:
+            print(f"Error updating semantic index: {e}")
+    
+    def semantic_search(self, query: str, memory_type: str = None, limit: int = 10,
+                        min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """Retrieve memories by embedding similarity rather than shared words."""
+        try:
+            # Queued memories are embedded as their batch commits
+            self._await_pending_writes()
             
-            sql += " ORDER BY importance_score DESC, timestamp DESC LIMIT ?"
-            params.append(limit)
+            # Over-fetch when filtering by type, since the index holds every type
+            k = limit * Config.VECTOR_TYPE_FILTER_OVERFETCH if memory_type else limit
+            hits = [(memory_id, score)
+                    for memory_id, score in self._get_vector_index().search([query], k)[0]
+                    if score >= min_score]
+            if not hits:
+                return []
             
-            cursor.execute(sql, params)
-            rows = cursor.fetchall()
+            placeholders = ", ".join("?" for _ in hits)
+            sql = f"""
+                SELECT {queries.MEMORY_COLUMNS} FROM memory m
+                WHERE m.id IN ({placeholders}) AND m.user_id = ?
+            """
+            params = [memory_id for memory_id, _ in hits] + [self.user_id]
+            if memory_type:
+                sql += " AND m.memory_type = ?"
+                params.append(memory_type)
             
-            memories = []
-            for row in rows:
-                memory = {
-                    'id': row[0],
-                    'user_id': row[1],
-                    'memory_type': row[2],
-                    'content': row[3],
-                    'keywords': json.loads(row[4]) if row[4] else [],
-                    'timestamp': row[5],
-                    'importance_score': row[6],
-                    'context_tags': json.loads(row[7]) if row[7] else []
-                }
-                memories.append(memory)
+            cursor = self._get_connection().execute(sql, params)
+            rows_by_id = {row[0]: row for row in cursor.fetchall()}
+            cursor.close()
             
-            conn.close()
-            return memories
+            memories = [self._row_to_memory(rows_by_id[memory_id])
+                        for memory_id, _ in hits if memory_id in rows_by_id]
+            return memories[:limit]
+        except Exception as e:
+            print(f"Error in semantic memory search: {e}")
+            return []
+    
+    def _build_match_query(self, query: str) -> str:
+        """Turn free text into an FTS5 OR-query of quoted terms."""
+        terms = []
+        for term in _TERM_PATTERN.findall(query.lower()):
+            if term not in _SEARCH_STOP_WORDS and term not in terms:
+                terms.append(term)
+        return " OR ".join(f'"{term}"' for term in terms)
+    
+    def retrieve_memories(self, query: str = None, memory_type: str = None,
+                         limit: int = 10) -> List[Dict[str, Any]]:
+        """Retrieve memories based on query or type."""
+        key = (self.user_id, query, memory_type, limit)
+        cached = self.memory_cache.get(key)
+        if cached is not MISSING:
+            return [dict(memory) for memory in cached]
+        
+        try:
+            version = self.memory_cache.version
+            memories = self._query_memories(query, memory_type, limit)
         except Exception as e:
             print(f"Error retrieving memories: {e}")
             return []
+        
+        self.memory_cache.put(key, memories, version)
+        return [dict(memory) for memory in memories]
     
+    def _query_memories(self, query: str, memory_type: str, limit: int) -> List[Dict[str, Any]]:
+        """Run a memory lookup against the database."""
+        self._await_pending_writes()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        if query:
+            match_query = self._build_match_query(query)
+            if not match_query:
+                return []
+            
+            # Best BM25 candidates of this user, reranked by importance and recency
+            if memory_type:
+                sql = queries.MEMORY_SEARCH_BY_TYPE
+                params = [match_query, self.user_id, memory_type]
+            else:
+                sql, params = queries.MEMORY_SEARCH, [match_query, self.user_id]
+            params.extend([Config.MEMORY_SEARCH_CANDIDATES, Config.MEMORY_RECENCY_HALF_LIFE_DAYS, limit])
+        elif memory_type:
+            sql, params = queries.MEMORIES_BY_TYPE_BY_RANK, [self.user_id, memory_type, limit]
+        else:
+            sql, params = queries.MEMORIES_BY_RANK, [self.user_id, limit]
+        
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        
+        memories = [self._row_to_memory(row) for row in rows]
+        cursor.close()
+        
+        # No shared words: fall back to meaning-level matches
+        if query and not memories:
+            return self.semantic_search(query, memory_type, limit,
+                                        min_score=Config.SEMANTIC_MIN_SCORE)
+        return memories
+
     def store_event(self, title: str, event_date: datetime.datetime,
                    description: str = "", reminder_minutes: int = 60) -> bool:
         """Store an event/reminder."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
             reminder_date = event_date - datetime.timedelta(minutes=reminder_minutes)
             
-            cursor.execute("""
-                INSERT INTO events (user_id, title, description, event_date, reminder_date)
-                VALUES (?, ?, ?, ?, ?)
-            """, (self.user_id, title, description, event_date, reminder_date))
-            
-            conn.commit()
-            conn.close()
+            conn = self._get_connection()
+            with conn:
+                conn.execute("""
+                    INSERT INTO events (user_id, title, description, event_date, reminder_date)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (self.user_id, title, description, event_date, reminder_date))
             return True
         except Exception as e:
             print(f"Error storing event: {e}")
@@ -108,68 +369,76 @@ class MemoryManager:
     def get_upcoming_events(self, days_ahead: int = 7) -> List[Dict[str, Any]]:
         """Get upcoming events."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            end_date = datetime.datetime.now() + datetime.timedelta(days=days_ahead)
-            
-            cursor.execute("""
-                SELECT * FROM events 
-                WHERE user_id = ? AND event_date >= datetime('now') 
-                AND event_date <= ? AND is_completed = FALSE
-                ORDER BY event_date ASC
-            """, (self.user_id, end_date))
-            
-            rows = cursor.fetchall()
-            events = []
-            for row in rows:
-                event = {
-                    'id': row[0],
-                    'title': row[2],
-                    'description': row[3],
-                    'event_date': row[4],
-                    'reminder_date': row[5],
-                    'is_completed': row[6]
-                }
-                events.append(event)
-            
-            conn.close()
-            return events
+            return [event._asdict() for event in self.iter_upcoming_events(days_ahead)]
         except Exception as e:
             print(f"Error getting events: {e}")
             return []
     
+    def iter_upcoming_events(self, days_ahead: int = 7, after: tuple = None,
+                             chunk_size: int = None) -> Iterator[EventRecord]:
+        """Stream pending events in date order.
+        
+        `after` is an (event_date, id) pair; pages continue strictly after it.
+        """
+        chunk_size = chunk_size or Config.STREAM_CHUNK_SIZE
+        end_date = datetime.datetime.now() + datetime.timedelta(days=days_ahead)
+        event_date, event_id = after or ('', 0)
+        
+        while True:
+            cursor = self._get_connection().execute(
+                queries.UPCOMING_EVENTS_AFTER,
+                (self.user_id, end_date, event_date, event_id, chunk_size)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+            
+            for row in rows:
+                yield EventRecord(*row)
+            if len(rows) < chunk_size:
+                return
+            event_date, event_id = rows[-1][3], rows[-1][0]
+    
+    def get_events_page(self, days_ahead: int = 7, after: tuple = None,
+                        limit: int = 50) -> Dict[str, Any]:
+        """One page of upcoming events plus the token for the next page."""
+        try:
+            events = [event._asdict() for event in
+                      islice(self.iter_upcoming_events(days_ahead, after, limit), limit)]
+            next_after = ([events[-1]['event_date'], events[-1]['id']]
+                          if len(events) == limit else None)
+            return {'items': events, 'next_after': next_after}
+        except Exception as e:
+            print(f"Error paging events: {e}")
+            return {'items': [], 'next_after': None}
+    
     def store_emotion(self, emotion: str, confidence: float, text_input: str = ""):
         """Store emotion detection result."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self._execute_write("""
                 INSERT INTO emotion_history (user_id, emotion, confidence, text_input)
                 VALUES (?, ?, ?, ?)
             """, (self.user_id, emotion, confidence, text_input))
-            
-            conn.commit()
-            conn.close()
         except Exception as e:
             print(f"Error storing emotion: {e}")
     
     def get_emotion_pattern(self, days: int = 7) -> Dict[str, float]:
         """Get emotion patterns over time."""
         try:
+            self._await_pending_writes()
             conn = self._get_connection()
             cursor = conn.cursor()
             
+            # Whole days come from the daily rollup; the partial first day
+            # from the hourly one, so the window has hour resolution.
             start_date = datetime.datetime.now() - datetime.timedelta(days=days)
+            start_hour = start_date.replace(minute=0, second=0, microsecond=0)
+            next_day = start_hour.replace(hour=0) + datetime.timedelta(days=1)
             
-            cursor.execute("""
-                SELECT emotion, AVG(confidence) as avg_confidence, COUNT(*) as count
-                FROM emotion_history 
-                WHERE user_id = ? AND timestamp >= ?
-                GROUP BY emotion
-                ORDER BY avg_confidence DESC
-            """, (self.user_id, start_date))
+            cursor.execute(queries.EMOTION_PATTERN, (
+                self.user_id, start_hour.strftime('%Y-%m-%d %H:00:00'),
+                next_day.strftime('%Y-%m-%d %H:00:00'),
+                self.user_id, next_day.strftime('%Y-%m-%d')
+            ))
             
             rows = cursor.fetchall()
             pattern = {}
@@ -179,8 +448,49 @@ class MemoryManager:
                     'count': row[2]
                 }
             
-            conn.close()
+            cursor.close()
             return pattern
         except Exception as e:
             print(f"Error getting emotion pattern: {e}")
-            return {}
\ No newline at end of file
+            return {}
+    
+    def iter_emotion_history(self, before_id: int = None,
+                             chunk_size: int = None) -> Iterator[EmotionRecord]:
+        """Stream raw emotion history, newest first."""
+        self._await_pending_writes()
+        yield from self._iter_keyset(queries.EMOTION_HISTORY_BEFORE_ID, [self.user_id],
+                                     before_id or _MAX_ROW_ID,
+                                     chunk_size or Config.STREAM_CHUNK_SIZE,
+                                     lambda row: EmotionRecord(*row))
+    
+    def get_emotion_history_page(self, before_id: int = None, limit: int = 50) -> Dict[str, Any]:
+        """One page of raw emotion history plus the token for the next page."""
+        try:
+            emotions = [emotion._asdict() for emotion in
+                        islice(self.iter_emotion_history(before_id, limit), limit)]
+            next_before_id = emotions[-1]['id'] if len(emotions) == limit else None
+            return {'items': emotions, 'next_before_id': next_before_id}
+        except Exception as e:
+            print(f"Error paging emotion history: {e}")
+            return {'items': [], 'next_before_id': None}
+    
+    def compact_emotion_history(self):
+        """Apply retention: drop raw emotion rows and hourly rollups past their window.
+        
+        Every insert is already folded into the hourly and daily rollups by a
+        trigger, so old raw rows can go without changing any pattern result.
+        """
+        try:
+            self._await_pending_writes()
+            now = datetime.datetime.now()
+            raw_cutoff = now - datetime.timedelta(days=Config.EMOTION_RAW_RETENTION_DAYS)
+            hourly_cutoff = now - datetime.timedelta(days=Config.EMOTION_HOURLY_RETENTION_DAYS)
+            
+            conn = self._get_connection()
+            with conn:
+                conn.execute(queries.DELETE_OLD_EMOTIONS,
+                             (self.user_id, raw_cutoff.strftime('%Y-%m-%d %H:%M:%S')))
+                conn.execute(queries.DELETE_OLD_HOURLY_ROLLUPS,
+                             (self.user_id, hourly_cutoff.strftime('%Y-%m-%d %H:00:00')))
+        except Exception as e:
+            print(f"Error compacting emotion history: {e}")
\ No newline at end of file
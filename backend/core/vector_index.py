@@ -0,0 +1,316 @@
+import hashlib
+import importlib
+import json
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+from config import Config
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_SAFE_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+class HashingEncoder:
+    """Offline encoder: signed feature hashing of words and character trigrams."""
+
+    name = "hashing"
+
+    def __init__(self, dim: int = None):
+        self.dim = dim or Config.VECTOR_DIM
+
+    def _features(self, text: str) -> List[str]:
+        """Words plus boundary-marked trigrams, so inflections still overlap."""
+        features = []
+        for word in _WORD_PATTERN.findall(text.lower()):
+            features.append(word)
+            marked = f"#{word}#"
+            features.extend(marked[i:i + 3] for i in range(len(marked) - 2))
+        return features
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into L2-normalised float32 rows."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # crc32 is stable across processes, unlike hash()
+                bucket = zlib.crc32(feature.encode('utf-8'))
+                sign = 1.0 if bucket & 0x80000000 else -1.0
+                vectors[row, bucket % self.dim] += sign
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+def index_directory(root: Path, user_id: str) -> Path:
+    """Directory for a user's index; ids that are not plain names are hashed, never used as paths."""
+    if _SAFE_NAME.fullmatch(user_id):
+        return Path(root) / user_id
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", user_id)[:32]
+    digest = hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:16]
+    return Path(root) / f"{slug}-{digest}"
+
+def get_encoder(spec: str = None):
+    """Build the configured encoder ("hashing" or "package.module:ClassName")."""
+    spec = spec or Config.VECTOR_ENCODER
+    if spec == "hashing":
+        return HashingEncoder()
+
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k columns per query row, sorted by descending score."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return rows[:, :0], scores[:, :0]
+
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    return np.take_along_axis(rows, best, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+class VectorIndex:
+    """Append-only, memory-mapped float32 embedding matrix with top-k search.
+
+    Rows live in a contiguous file that doubles in size as it fills. Below
+    VECTOR_IVF_THRESHOLD rows queries are brute-force dot products over
+    blocks of the map; above it an IVF partitioning limits each query to the
+    rows of its closest centroids. Partitions are trained on a background
+    thread; searches use the previous ones (or brute force) until it is done.
+    """
+
+    def __init__(self, directory: Path, encoder):
+        self.directory = Path(directory)
+        self.encoder = encoder
+        self.dim = encoder.dim
+        self._lock = threading.RLock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.count = 0
+        self.trained_count = 0
+
+        meta = self._read_meta()
+        encoder_name = getattr(encoder, 'name', type(encoder).__name__)
+        if meta and meta['dim'] == self.dim and meta['encoder'] == encoder_name:
+            self.count = meta['count']
+            self.trained_count = meta.get('trained_count', 0)
+        self.encoder_name = encoder_name
+
+        self.capacity = max(Config.VECTOR_INITIAL_CAPACITY, self.count)
+        self._map_files()
+
+        self.centroids = None
+        self._lists = None
+        self._appended = None
+        self._trainer = None
+        if self.trained_count and (self.directory / "centroids.npy").exists():
+            self.centroids = np.load(self.directory / "centroids.npy")
+            self._build_lists()
+
+    def _read_meta(self) -> dict:
+        """Read index metadata, if any."""
+        try:
+            with open(self.directory / "meta.json", 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        """Persist row count and layout atomically."""
+        meta = {
+            'dim': self.dim,
+            'encoder': self.encoder_name,
+            'count': self.count,
+            'trained_count': self.trained_count
+        }
+        temp_path = self.directory / "meta.json.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self.directory / "meta.json")
+
+    def _map(self, name: str, dtype, shape: tuple) -> np.memmap:
+        """Map a file, extending it on disk to hold `shape`."""
+        path = self.directory / name
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, 'ab'):
+            pass
+        if os.path.getsize(path) < nbytes:
+            os.truncate(path, nbytes)
+        return np.memmap(path, dtype=dtype, mode='r+', shape=shape)
+
+    def _map_files(self):
+        """(Re)map the vector, id and partition-assignment files."""
+        self.vectors = self._map("vectors.f32", np.float32, (self.capacity, self.dim))
+        self.ids = self._map("ids.i64", np.int64, (self.capacity,))
+        self.assignments = self._map("assign.i32", np.int32, (self.capacity,))
+
+    def _grow(self, needed: int):
+        """Double capacity until `needed` rows fit."""
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+
+        for mapped in (self.vectors, self.ids, self.assignments):
+            mapped.flush()
+        self.vectors = self.ids = self.assignments = None
+        self.capacity = capacity
+        self._map_files()
+
+    @property
+    def max_id(self) -> int:
+        """Highest memory id indexed so far (ids are appended in order)."""
+        with self._lock:
+            return int(self.ids[self.count - 1]) if self.count else 0
+
+    def add(self, ids: List[int], texts: List[str]):
+        """Encode and append rows for new memories."""
+        if not ids:
+            return
+
+        vectors = self.encoder.encode(texts).astype(np.float32, copy=False)
+        with self._lock:
+            start, end = self.count, self.count + len(ids)
+            self._grow(end)
+            self.vectors[start:end] = vectors
+            self.ids[start:end] = ids
+
+            if self.centroids is not None:
+                assigned = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+                self.assignments[start:end] = assigned
+                for offset, partition in enumerate(assigned):
+                    self._appended[partition].append(start + offset)
+                self.assignments.flush()
+
+            self.count = end
+
+            # Partition once the index is large, and re-partition as it doubles
+            if (self.count >= Config.VECTOR_IVF_THRESHOLD and self.count >= 2 * self.trained_count
+                    and self._trainer is None):
+                self._trainer = threading.Thread(target=self._train_partitions, daemon=True)
+                self._trainer.start()
+
+            self.vectors.flush()
+            self.ids.flush()
+            self._write_meta()
+
+    def wait_for_partitions(self, timeout: float = None) -> bool:
+        """Block until a partition training in progress has finished."""
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join(timeout)
+        return self._trainer is None
+
+    def _train_partitions(self):
+        """Spherical k-means over a sample, then assign every row to a centroid.
+
+        Runs on the trainer thread without the lock; only the swap of the new
+        partitions into place holds it.
+        """
+        try:
+            with self._lock:
+                count, vectors = self.count, self.vectors
+
+            n_lists = max(1, int(np.sqrt(count)))
+            rng = np.random.default_rng(0)
+            sample_size = min(count, Config.VECTOR_IVF_TRAIN_SAMPLE)
+            sample = np.asarray(vectors[np.sort(rng.choice(count, sample_size, replace=False))])
+
+            centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+            for _ in range(Config.VECTOR_IVF_TRAIN_ITERATIONS):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                # Empty clusters keep their previous centroid
+                filled = norms[:, 0] > 0
+                centroids[filled] = sums[filled] / norms[filled]
+
+            assigned = np.empty(count, dtype=np.int32)
+            for start in range(0, count, Config.VECTOR_SEARCH_BLOCK):
+                end = min(start + Config.VECTOR_SEARCH_BLOCK, count)
+                assigned[start:end] = np.argmax(vectors[start:end] @ centroids.T, axis=1)
+
+            with self._lock:
+                # Rows appended while training are assigned here
+                if self.count > count:
+                    assigned = np.concatenate([assigned, np.argmax(
+                        self.vectors[count:self.count] @ centroids.T, axis=1
+                    ).astype(np.int32)])
+                self.assignments[:self.count] = assigned
+                self.assignments.flush()
+
+                self.centroids = centroids
+                np.save(self.directory / "centroids.npy", centroids)
+                self.trained_count = self.count
+                self._build_lists()
+                self._write_meta()
+        except Exception as e:
+            print(f"Error partitioning vector index: {e}")
+        finally:
+            with self._lock:
+                self._trainer = None
+
+    def _build_lists(self):
+        """Group row numbers by partition from the assignment file."""
+        assigned = np.asarray(self.assignments[:self.count])
+        order = np.argsort(assigned, kind='stable')
+        bounds = np.searchsorted(assigned[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        # Rows added since the last build, until the next re-partition
+        self._appended = [[] for _ in range(len(self.centroids))]
+
+    def search(self, queries: List[str], k: int = 10) -> List[List[Tuple[int, float]]]:
+        """Top-k (memory_id, cosine score) pairs for each query text."""
+        query_vectors = self.encoder.encode(queries).astype(np.float32, copy=False)
+
+        with self._lock:
+            if self.count == 0:
+                return [[] for _ in queries]
+            if self.centroids is None:
+                rows, scores = self._search_exact(query_vectors, k)
+            else:
+                rows, scores = self._search_partitions(query_vectors, k)
+
+            return [
+                [(int(self.ids[row]), float(score)) for row, score in zip(query_rows, query_scores)]
+                for query_rows, query_scores in zip(rows, scores)
+            ]
+
+    def _search_exact(self, query_vectors: np.ndarray, k: int):
+        """Brute force, streaming the map in blocks and merging top-k."""
+        n_queries = len(query_vectors)
+        best_rows = np.empty((n_queries, 0), dtype=np.int64)
+        best_scores = np.empty((n_queries, 0), dtype=np.float32)
+
+        for start in range(0, self.count, Config.VECTOR_SEARCH_BLOCK):
+            end = min(start + Config.VECTOR_SEARCH_BLOCK, self.count)
+            scores = query_vectors @ self.vectors[start:end].T
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_rows, best_scores = _top_k(
+                np.hstack([best_scores, scores]), np.hstack([best_rows, rows]), k
+            )
+        return best_rows, best_scores
+
+    def _search_partitions(self, query_vectors: np.ndarray, k: int):
+        """IVF search: score only rows in the closest partitions."""
+        n_probe = min(Config.VECTOR_IVF_NPROBE, len(self.centroids))
+        probes = np.argsort(-(query_vectors @ self.centroids.T), axis=1)[:, :n_probe]
+
+        results_rows, results_scores = [], []
+        for query_vector, query_probes in zip(query_vectors, probes):
+            candidates = np.concatenate(
+                [self._lists[partition] for partition in query_probes]
+                + [np.asarray(self._appended[partition], dtype=np.int64) for partition in query_probes]
+            ).astype(np.int64, copy=False)
+            candidates.sort()
+            scores = (self.vectors[candidates] @ query_vector)[None, :]
+            rows, scores = _top_k(scores, candidates[None, :], k)
+            results_rows.append(rows[0])
+            results_scores.append(scores[0])
+        return results_rows, results_scores
\ No newline at end of file
@@ -134,6 +134,13 @@ class VoiceHandler:
         except queue.Empty:
             return ""
     
+    def wait_for_command(self, timeout: float = None) -> str:
+        """Block until a command arrives or the timeout passes."""
+        try:
+            return self.command_queue.get(timeout=timeout)
+        except queue.Empty:
+            return ""
+    
     def has_commands(self) -> bool:
         """Check if there are pending commands."""
         return not self.command_queue.empty()
\ No newline at end of file
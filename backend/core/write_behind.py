@@ -0,0 +1,176 @@
+import queue
+import sqlite3
+import threading
+import time
+from itertools import groupby
+from typing import Callable, Optional
+from config import Config
+
+_STOP = object()
+
+class WriteBehindQueue:
+    """Bounded insert queue that group-commits batches on a background thread."""
+
+    def __init__(self, pool, max_size: int = None, batch_size: int = None,
+                 flush_interval: float = None):
+        self.pool = pool
+        self.batch_size = batch_size or Config.WRITE_BEHIND_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.WRITE_BEHIND_FLUSH_INTERVAL
+        self._queue = queue.Queue(maxsize=max_size or Config.WRITE_BEHIND_QUEUE_SIZE)
+        self._pending = {}
+        self._submitting = 0  # Submits between their _running check and their put
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Start the background writer."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._writer_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, user_id: str, sql: str, params: tuple,
+               on_commit: Optional[Callable[[], None]] = None) -> bool:
+        """Queue an insert. Returns False if the caller must write it directly.
+
+        `on_commit` runs on the writer thread once the insert's batch is committed.
+        """
+        with self._condition:
+            # A writer that died would never commit this; the caller writes instead
+            if not self._running or not self._thread.is_alive():
+                return False
+            self._pending[user_id] = self._pending.get(user_id, 0) + 1
+            self._submitting += 1
+
+        try:
+            # Blocking here is the backpressure: producers slow to the writer's pace
+            self._queue.put((user_id, sql, params, on_commit), timeout=Config.WRITE_BEHIND_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            self._mark_done([user_id])
+            return False
+        finally:
+            with self._condition:
+                self._submitting -= 1
+                self._condition.notify_all()
+
+    def wait_for(self, user_id: str, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued for a user is committed."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending.get(user_id), timeout=timeout
+            )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued write is committed."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not any(self._pending.values()), timeout=timeout
+            )
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flush outstanding writes and stop the writer thread."""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            # Submits already past their check put before the stop marker
+            self._condition.wait_for(lambda: not self._submitting)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _writer_loop(self):
+        """Collect items into batches by size or time window and commit them."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+
+        # Anything still queued behind the stop marker is written, not dropped
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            self._commit(remaining[start:start + self.batch_size])
+
+    def _commit(self, batch: list):
+        """Write one batch in a single transaction."""
+        try:
+            conn = self.pool.get_connection()
+            with conn:
+                # Consecutive inserts into the same table share one executemany
+                for sql, items in groupby(batch, key=lambda item: item[1]):
+                    conn.executemany(sql, [item[2] for item in items])
+        except Exception as e:
+            # The callers were told their rows are stored: retry them one by
+            # one so a single bad row cannot take the batch down with it
+            print(f"Error flushing queued writes, retrying individually: {e}")
+            self._commit_each(batch)
+        finally:
+            self._run_callbacks(batch)
+            self._mark_done([item[0] for item in batch])
+
+    def _commit_each(self, batch: list):
+        """Write items in separate transactions, retrying ones the database was too busy for."""
+        for _, sql, params, _ in batch:
+            for attempt in range(1, Config.WRITE_BEHIND_RETRIES + 1):
+                try:
+                    conn = self.pool.get_connection()
+                    with conn:
+                        conn.execute(sql, params)
+                    break
+                except sqlite3.OperationalError as e:
+                    if attempt == Config.WRITE_BEHIND_RETRIES:
+                        print(f"Error writing queued row, dropping it: {e}")
+                    else:
+                        time.sleep(0.1 * attempt)
+                except Exception as e:
+                    print(f"Error writing queued row, dropping it: {e}")
+                    break
+
+    def _run_callbacks(self, batch: list):
+        """Run each distinct commit callback of a batch once, before waiters wake."""
+        callbacks = []
+        for item in batch:
+            if item[3] is not None and item[3] not in callbacks:
+                callbacks.append(item[3])
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in write commit callback: {e}")
+
+    def _mark_done(self, user_ids: list):
+        """Release pending counts and wake readers waiting on them."""
+        with self._condition:
+            for user_id in user_ids:
+                self._pending[user_id] -= 1
+                if not self._pending[user_id]:
+                    del self._pending[user_id]
+            self._condition.notify_all()
\ No newline at end of file
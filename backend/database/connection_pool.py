@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import weakref
+from config import Config
+
+class _ThreadConnection:
+    """A thread's connection, held in its thread-local storage."""
+
+    __slots__ = ('connection', '__weakref__')
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+class ConnectionPool:
+    """Per-thread pool of long-lived, tuned SQLite connections.
+
+    A connection lives as long as the thread (or greenlet) that opened it:
+    when the thread exits, its thread-local holder is freed and a finalizer
+    closes the connection and drops it from the pool.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = str(db_path or Config.DATABASE_PATH)
+        self._local = threading.local()
+        self._connections = []
+        # Reentrant: a finalizer may run in a thread that already holds it
+        self._lock = threading.RLock()
+        self._closed = False
+
+    def _configure(self, conn: sqlite3.Connection):
+        """Apply journal and cache pragmas to a new connection."""
+        conn.execute(f"PRAGMA journal_mode = {Config.SQLITE_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {Config.SQLITE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size = {int(Config.SQLITE_CACHE_SIZE)}")
+        conn.execute(f"PRAGMA mmap_size = {int(Config.SQLITE_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use."""
+        holder = getattr(self._local, 'holder', None)
+        if holder is not None:
+            return holder.connection
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool has been closed")
+
+            # The statement cache keeps prepared statements alive per connection
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=Config.SQLITE_BUSY_TIMEOUT,
+                check_same_thread=False,
+                cached_statements=Config.SQLITE_STATEMENT_CACHE_SIZE
+            )
+            self._configure(conn)
+            self._connections.append(conn)
+
+        holder = _ThreadConnection(conn)
+        weakref.finalize(holder, self._release, conn)
+        self._local.holder = holder
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        """Close the connection of a thread that has exited."""
+        with self._lock:
+            if conn not in self._connections:
+                return
+            self._connections.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error closing database connection: {e}")
+
+    def size(self) -> int:
+        """Number of open connections."""
+        with self._lock:
+            return len(self._connections)
+
+    def close_all(self):
+        """Close every connection handed out by this pool."""
+        with self._lock:
+            self._closed = True
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    print(f"Error closing database connection: {e}")
+            self._connections.clear()
+            self._local = threading.local()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=None) -> ConnectionPool:
+    """Get the shared connection pool for a database file."""
+    key = str(db_path or Config.DATABASE_PATH)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(key)
+            _pools[key] = pool
+        return pool
+
+def close_all_pools():
+    """Shutdown hook: close all pooled connections."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
\ No newline at end of file
@@ -2,6 +2,7 @@ import sqlite3
 import os
 from pathlib import Path
 from config import Config
+from database.migrations import apply_migrations
 
 def initialize_database():
     """Initialize the SQLite database with required tables."""
@@ -21,6 +22,9 @@ def initialize_database():
     # Execute schema
     cursor.executescript(schema_sql)
     
+    # Bring existing databases up to the current schema version
+    apply_migrations(conn)
+    
     # Create default user if not exists
     cursor.execute("""
         INSERT OR IGNORE INTO users (user_id, name, preferences) 
@@ -0,0 +1,262 @@
+import sqlite3
+import sys
+from config import Config
+from database import queries
+
+# Ordered schema migrations: (user_version, description, SQL script).
+# Append new entries; never edit one that has shipped.
+MIGRATIONS = [
+    (1, "Full-text index over memory content and keywords", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+            content,
+            keywords,
+            content='memory',
+            content_rowid='id',
+            tokenize='porter unicode61'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS memory_fts_insert AFTER INSERT ON memory BEGIN
+            INSERT INTO memory_fts (rowid, content, keywords)
+            VALUES (new.id, new.content, new.keywords);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS memory_fts_delete AFTER DELETE ON memory BEGIN
+            INSERT INTO memory_fts (memory_fts, rowid, content, keywords)
+            VALUES ('delete', old.id, old.content, old.keywords);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS memory_fts_update AFTER UPDATE OF content, keywords ON memory BEGIN
+            INSERT INTO memory_fts (memory_fts, rowid, content, keywords)
+            VALUES ('delete', old.id, old.content, old.keywords);
+            INSERT INTO memory_fts (rowid, content, keywords)
+            VALUES (new.id, new.content, new.keywords);
+        END;
+
+        -- Backfill rows stored before the index existed
+        INSERT INTO memory_fts (memory_fts) VALUES ('rebuild');
+    """),
+    (2, "Composite indexes for per-user hot queries", """
+        -- retrieve_memories without a search query
+        CREATE INDEX IF NOT EXISTS idx_memory_user_rank
+            ON memory (user_id, importance_score DESC, timestamp DESC);
+        CREATE INDEX IF NOT EXISTS idx_memory_user_type_rank
+            ON memory (user_id, memory_type, importance_score DESC, timestamp DESC);
+
+        -- get_upcoming_events
+        CREATE INDEX IF NOT EXISTS idx_events_user_pending
+            ON events (user_id, is_completed, event_date);
+
+        -- get_emotion_pattern (covering: no table lookups)
+        CREATE INDEX IF NOT EXISTS idx_emotion_user_time
+            ON emotion_history (user_id, timestamp, emotion, confidence);
+
+        -- load_context_from_db, cleanup_expired_context, set_context
+        CREATE INDEX IF NOT EXISTS idx_context_user_expiry
+            ON conversation_context (user_id, expires_at);
+    """),
+    (3, "Hourly and daily emotion rollups", """
+        CREATE TABLE IF NOT EXISTS emotion_rollup_hourly (
+            user_id TEXT NOT NULL,
+            bucket TEXT NOT NULL, -- 'YYYY-MM-DD HH:00:00'
+            emotion TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            confidence_min REAL NOT NULL,
+            confidence_max REAL NOT NULL,
+            PRIMARY KEY (user_id, bucket, emotion)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS emotion_rollup_daily (
+            user_id TEXT NOT NULL,
+            bucket TEXT NOT NULL, -- 'YYYY-MM-DD'
+            emotion TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            confidence_min REAL NOT NULL,
+            confidence_max REAL NOT NULL,
+            PRIMARY KEY (user_id, bucket, emotion)
+        ) WITHOUT ROWID;
+
+        -- Fold every new emotion row into both rollups
+        CREATE TRIGGER IF NOT EXISTS emotion_rollup_insert AFTER INSERT ON emotion_history BEGIN
+            INSERT INTO emotion_rollup_hourly (user_id, bucket, emotion, count,
+                                               confidence_sum, confidence_min, confidence_max)
+            VALUES (new.user_id, strftime('%Y-%m-%d %H:00:00', new.timestamp), new.emotion, 1,
+                    new.confidence, new.confidence, new.confidence)
+            ON CONFLICT (user_id, bucket, emotion) DO UPDATE SET
+                count = count + 1,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_min = MIN(confidence_min, excluded.confidence_min),
+                confidence_max = MAX(confidence_max, excluded.confidence_max);
+
+            INSERT INTO emotion_rollup_daily (user_id, bucket, emotion, count,
+                                              confidence_sum, confidence_min, confidence_max)
+            VALUES (new.user_id, date(new.timestamp), new.emotion, 1,
+                    new.confidence, new.confidence, new.confidence)
+            ON CONFLICT (user_id, bucket, emotion) DO UPDATE SET
+                count = count + 1,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_min = MIN(confidence_min, excluded.confidence_min),
+                confidence_max = MAX(confidence_max, excluded.confidence_max);
+        END;
+
+        -- Backfill from the rows already stored
+        INSERT INTO emotion_rollup_hourly
+        SELECT user_id, strftime('%Y-%m-%d %H:00:00', timestamp), emotion, COUNT(*),
+               SUM(confidence), MIN(confidence), MAX(confidence)
+        FROM emotion_history
+        GROUP BY 1, 2, 3;
+
+        INSERT INTO emotion_rollup_daily
+        SELECT user_id, date(timestamp), emotion, COUNT(*),
+               SUM(confidence), MIN(confidence), MAX(confidence)
+        FROM emotion_history
+        GROUP BY 1, 2, 3;
+    """),
+    (4, "Keyed conversation context for upserts", """
+        ALTER TABLE conversation_context ADD COLUMN context_key TEXT;
+
+        UPDATE conversation_context
+        SET context_key = JSON_EXTRACT(context_data, '$.key');
+
+        -- Keep only the newest row for each key before enforcing uniqueness
+        DELETE FROM conversation_context
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM conversation_context GROUP BY user_id, context_key
+        );
+
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_context_user_key
+            ON conversation_context (user_id, context_key);
+    """),
+    (5, "Indexes for keyset pagination by id", """
+        -- Rows within each index key are ordered by rowid, which is what
+        -- "WHERE user_id = ? AND id < ? ORDER BY id DESC" walks.
+        CREATE INDEX IF NOT EXISTS idx_memory_user ON memory (user_id);
+        CREATE INDEX IF NOT EXISTS idx_memory_user_type ON memory (user_id, memory_type);
+        CREATE INDEX IF NOT EXISTS idx_emotion_user ON emotion_history (user_id);
+    """),
+    (6, "Face encodings, one row per enrollment", """
+        CREATE TABLE IF NOT EXISTS face_encodings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL, -- Name the face was registered under
+            encoding BLOB NOT NULL, -- 128 little-endian float32 values
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        );
+
+        -- delete_user and per-user counts
+        CREATE INDEX IF NOT EXISTS idx_face_encodings_user ON face_encodings (user_id);
+
+        -- Encodings already stored on user rows in the same format
+        INSERT INTO face_encodings (user_id, encoding)
+        SELECT user_id, face_encoding FROM users WHERE length(face_encoding) = 512;
+    """),
+]
+
+# Queries on the request path that must be answered from an index, with
+# sample parameters. The SQL is shared with the code that runs it.
+HOT_QUERIES = {
+    "retrieve_memories": (queries.MEMORIES_BY_RANK, ("default_user", 10)),
+    "retrieve_memories_by_type": (queries.MEMORIES_BY_TYPE_BY_RANK, ("default_user", "fact", 10)),
+    "retrieve_memories_search": (queries.MEMORY_SEARCH,
+                                 ('"birthday"', "default_user", 200, 30.0, 10)),
+    "retrieve_memories_search_by_type": (queries.MEMORY_SEARCH_BY_TYPE,
+                                         ('"birthday"', "default_user", "fact", 200, 30.0, 10)),
+    "sync_vector_index": (queries.MEMORIES_AFTER_ID, ("default_user", 0)),
+    "get_emotion_pattern": (queries.EMOTION_PATTERN,
+                            ("default_user", "2000-01-01 00:00:00", "2000-01-02 00:00:00",
+                             "default_user", "2000-01-02")),
+    "compact_emotion_history": (queries.DELETE_OLD_EMOTIONS, ("default_user", "2000-01-01 00:00:00")),
+    "compact_hourly_rollups": (queries.DELETE_OLD_HOURLY_ROLLUPS,
+                               ("default_user", "2000-01-01 00:00:00")),
+    "iter_memories": (queries.MEMORIES_BEFORE_ID, ("default_user", 2 ** 63 - 1, 500)),
+    "iter_memories_by_type": (queries.MEMORIES_BY_TYPE_BEFORE_ID,
+                              ("default_user", "fact", 2 ** 63 - 1, 500)),
+    "iter_upcoming_events": (queries.UPCOMING_EVENTS_AFTER,
+                             ("default_user", "2100-01-01", "", 0, 500)),
+    "iter_emotion_history": (queries.EMOTION_HISTORY_BEFORE_ID, ("default_user", 2 ** 63 - 1, 500)),
+    "load_context_from_db": (queries.UNEXPIRED_CONTEXT, ("default_user",)),
+    "cleanup_expired_context": (queries.DELETE_EXPIRED_CONTEXT, ("default_user",)),
+}
+
+def _split_statements(script: str) -> list:
+    """Split a SQL script into complete statements (trigger bodies included)."""
+    statements = []
+    buffer = ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip() and not buffer.strip().startswith("--"):
+        statements.append(buffer.strip())
+    return statements
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Read the schema version stored in PRAGMA user_version."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations, each in its own transaction."""
+    current_version = get_schema_version(conn)
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+
+    try:
+        for version, description, script in MIGRATIONS:
+            if version <= current_version:
+                continue
+
+            conn.execute("BEGIN")
+            try:
+                for statement in _split_statements(script):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            current_version = version
+            print(f"Applied database migration {version}: {description}")
+    finally:
+        conn.isolation_level = isolation_level
+
+    return current_version
+
+def find_full_scans(conn: sqlite3.Connection) -> dict:
+    """Return hot queries whose plan scans a whole table, with the plan step.
+
+    Plans name tables by their alias (SCAN m), so any SCAN step counts
+    unless it goes through an index, a virtual table, or a subquery the
+    plan built itself (CO-ROUTINE or MATERIALIZE).
+    """
+    regressions = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        subqueries = {detail.split(" ", 1)[1] for detail in plan
+                      if detail.startswith(("CO-ROUTINE ", "MATERIALIZE "))}
+        for detail in plan:
+            if not detail.startswith("SCAN "):
+                continue
+            target = detail[len("SCAN "):].split(" USING ")[0].split(" VIRTUAL TABLE")[0]
+            if (" USING INDEX " in detail or " USING COVERING INDEX " in detail
+                    or "VIRTUAL TABLE" in detail or target in subqueries
+                    or target == "CONSTANT ROW"):
+                continue
+            regressions[name] = detail
+    return regressions
+
+if __name__ == "__main__":
+    # Usage: python -m database.migrations  (exits non-zero on a full scan)
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    print(f"Schema version: {apply_migrations(conn)}")
+
+    full_scans = find_full_scans(conn)
+    for name, detail in full_scans.items():
+        print(f"FULL SCAN in {name}: {detail}")
+    conn.close()
+
+    if full_scans:
+        sys.exit(1)
+    print("All hot queries use an index.")
\ No newline at end of file
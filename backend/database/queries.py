@@ -0,0 +1,108 @@
+# SQL run on the request path. MemoryManager and ContextManager execute
+# these strings and the plan check in database.migrations explains the same
+# strings, so the check always covers the queries that actually run.
+
+MEMORY_COLUMNS = ("m.id, m.user_id, m.memory_type, m.content, m.keywords, "
+                  "m.timestamp, m.importance_score, m.context_tags")
+
+EVENT_COLUMNS = "id, title, description, event_date, reminder_date, is_completed"
+
+EMOTION_COLUMNS = "id, emotion, confidence, text_input, timestamp"
+
+# retrieve_memories without a search query
+MEMORIES_BY_RANK = f"""
+    SELECT {MEMORY_COLUMNS} FROM memory m WHERE m.user_id = ?
+    ORDER BY m.importance_score DESC, m.timestamp DESC LIMIT ?
+"""
+MEMORIES_BY_TYPE_BY_RANK = f"""
+    SELECT {MEMORY_COLUMNS} FROM memory m WHERE m.user_id = ? AND m.memory_type = ?
+    ORDER BY m.importance_score DESC, m.timestamp DESC LIMIT ?
+"""
+
+# retrieve_memories with a search query: this user's best BM25 candidates,
+# reranked by relevance weighted with importance and a recency decay. The
+# user and type filters apply before the candidate limit, so other users'
+# matches cannot crowd this user's out. CROSS JOIN pins the join order so
+# memory is probed by id.
+_MEMORY_SEARCH = f"""
+    SELECT id, user_id, memory_type, content, keywords,
+           timestamp, importance_score, context_tags FROM (
+        SELECT {MEMORY_COLUMNS}, memory_fts.rank AS rank FROM memory_fts
+        CROSS JOIN memory m ON m.id = memory_fts.rowid
+        WHERE memory_fts MATCH ? AND m.user_id = ?{{type_filter}}
+        ORDER BY rank LIMIT ?
+    ) AS hits
+    ORDER BY rank * importance_score
+        / (1.0 + (julianday('now') - julianday(timestamp)) / ?)
+    LIMIT ?
+"""
+MEMORY_SEARCH = _MEMORY_SEARCH.format(type_filter="")
+MEMORY_SEARCH_BY_TYPE = _MEMORY_SEARCH.format(type_filter=" AND m.memory_type = ?")
+
+# iter_memories: keyset pages, newest first
+MEMORIES_BEFORE_ID = f"""
+    SELECT {MEMORY_COLUMNS} FROM memory m WHERE m.user_id = ?
+    AND m.id < ? ORDER BY m.id DESC LIMIT ?
+"""
+MEMORIES_BY_TYPE_BEFORE_ID = f"""
+    SELECT {MEMORY_COLUMNS} FROM memory m WHERE m.user_id = ? AND m.memory_type = ?
+    AND m.id < ? ORDER BY m.id DESC LIMIT ?
+"""
+
+# Semantic index sync: memories stored after the newest indexed id
+MEMORIES_AFTER_ID = """
+    SELECT id, content, keywords FROM memory
+    WHERE user_id = ? AND id > ?
+    ORDER BY id
+"""
+
+# iter_upcoming_events: keyset pages in (event_date, id) order
+UPCOMING_EVENTS_AFTER = f"""
+    SELECT {EVENT_COLUMNS} FROM events
+    WHERE user_id = ? AND event_date >= datetime('now')
+    AND event_date <= ? AND is_completed = FALSE
+    AND (event_date, id) > (?, ?)
+    ORDER BY event_date ASC, id ASC
+    LIMIT ?
+"""
+
+# get_emotion_pattern: whole days from the daily rollup, the partial first
+# day from the hourly one
+EMOTION_PATTERN = """
+    SELECT emotion, SUM(confidence_sum) / SUM(count) as avg_confidence,
+           SUM(count) as count
+    FROM (
+        SELECT emotion, count, confidence_sum FROM emotion_rollup_hourly
+        WHERE user_id = ? AND bucket >= ? AND bucket < ?
+        UNION ALL
+        SELECT emotion, count, confidence_sum FROM emotion_rollup_daily
+        WHERE user_id = ? AND bucket >= ?
+    )
+    GROUP BY emotion
+    ORDER BY avg_confidence DESC
+"""
+
+# iter_emotion_history: keyset pages, newest first
+EMOTION_HISTORY_BEFORE_ID = f"""
+    SELECT {EMOTION_COLUMNS} FROM emotion_history
+    WHERE user_id = ? AND id < ?
+    ORDER BY id DESC LIMIT ?
+"""
+
+# compact_emotion_history
+DELETE_OLD_EMOTIONS = """
+    DELETE FROM emotion_history WHERE user_id = ? AND timestamp < ?
+"""
+DELETE_OLD_HOURLY_ROLLUPS = """
+    DELETE FROM emotion_rollup_hourly WHERE user_id = ? AND bucket < ?
+"""
+
+# ContextManager.load_context_from_db and cleanup_expired_context
+UNEXPIRED_CONTEXT = """
+    SELECT context_data FROM conversation_context
+    WHERE user_id = ? AND expires_at > datetime('now')
+"""
+DELETE_EXPIRED_CONTEXT = """
+    DELETE FROM conversation_context
+    WHERE user_id = ? AND expires_at <= datetime('now')
+"""
@@ -0,0 +1,289 @@
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+# Vectorizer settings that fully describe the word analyzer and weighting
+_VECTORIZER_PARAMS = ('lowercase', 'token_pattern', 'ngram_range', 'strip_accents',
+                      'norm', 'use_idf', 'sublinear_tf')
+
+def save_arrays(directory, arrays: Dict[str, np.ndarray], meta: dict):
+    """Write arrays as .npy files plus meta.json, replacing the directory atomically.
+
+    Processes that still map the old files keep reading them; the next load
+    picks up the new directory. Between the two renames the previous version
+    exists only under its .old- name, which load_arrays falls back to.
+    """
+    directory = Path(directory)
+    # Unique per save, so no two saves ever share a file or directory name
+    save_id = uuid.uuid4().hex
+    temp_dir = directory.with_name(f"{directory.name}.tmp-{save_id}")
+    old_dir = directory.with_name(f"{directory.name}.old-{save_id}")
+    os.makedirs(temp_dir)
+
+    files = {}
+    for name, array in arrays.items():
+        files[name] = f"{name}-{save_id}.npy"
+        np.save(temp_dir / files[name], np.ascontiguousarray(array))
+    with open(temp_dir / "meta.json", 'w') as f:
+        # meta.json names this save's files, so a load can never pair it with another's
+        json.dump(dict(meta, _files=files), f)
+
+    if directory.exists():
+        os.replace(directory, old_dir)
+    os.replace(temp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def _read_arrays(directory: Path) -> Tuple[Dict[str, np.ndarray], dict]:
+    """Map the arrays of one save; FileNotFoundError if it moved or was deleted meanwhile."""
+    with open(directory / "meta.json", 'r') as f:
+        meta = json.load(f)
+
+    files = meta.pop('_files', None)
+    if files is None:
+        # Saved before file names were recorded
+        files = {path.stem: path.name for path in directory.glob("*.npy")}
+    arrays = {name: np.load(directory / file, mmap_mode='r') for name, file in files.items()}
+    return arrays, meta
+
+def load_arrays(directory) -> Tuple[Dict[str, np.ndarray], dict]:
+    """Map every array in a directory read-only; nothing is copied into memory.
+
+    A load racing save_arrays returns one complete save, never a mix: if the
+    directory is swapped out mid-read, the parked previous version is read
+    instead, or the new one once it is in place.
+    """
+    directory = Path(directory)
+    for _ in range(3):
+        try:
+            return _read_arrays(directory)
+        except FileNotFoundError:
+            pass
+
+        for old_dir in directory.parent.glob(f"{directory.name}.old-*"):
+            try:
+                return _read_arrays(old_dir)
+            except FileNotFoundError:
+                continue
+    return _read_arrays(directory)
+
+def dot_gathered(X: sparse.csr_matrix, gathered: np.ndarray) -> np.ndarray:
+    """X @ W.T given only W's columns at X.indices, shaped (n_classes, nnz)."""
+    gathered = np.asarray(gathered, dtype=np.float64)
+    if X.shape[0] == 1:
+        return (gathered @ X.data)[np.newaxis]
+    positions = sparse.csr_matrix(
+        (X.data, np.arange(len(X.indices)), X.indptr), shape=(X.shape[0], len(X.indices))
+    )
+    return np.asarray(positions @ gathered.T)
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    """Row-wise softmax; a plain max shift is far cheaper than scipy's logsumexp per call."""
+    probabilities = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+class CompactTfidfVectorizer:
+    """TfidfVectorizer.transform over a sorted, memory-mapped vocabulary.
+
+    `analyzer` replaces the word analyzer described by `params`, for
+    vocabularies fitted with a callable analyzer.
+    """
+
+    def __init__(self, terms: np.ndarray, idf: np.ndarray, params: dict,
+                 analyzer: Callable[[str], List[str]] = None):
+        self.terms = terms
+        self.idf = idf
+        self.params = params
+        self.analyzer = analyzer or CountVectorizer(
+            lowercase=params['lowercase'],
+            token_pattern=params['token_pattern'],
+            ngram_range=tuple(params['ngram_range']),
+            strip_accents=params['strip_accents']
+        ).build_analyzer()
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """Tf-idf rows for texts; terms outside the vocabulary are dropped."""
+        n_terms = len(self.terms)
+        grams_per_text = [self.analyzer(text) for text in texts]
+        lengths = [len(grams) for grams in grams_per_text]
+        # Natural-width strings, so long n-grams are never truncated into a match
+        grams = np.asarray([gram for text_grams in grams_per_text for gram in text_grams], dtype=str)
+
+        # Columns are in sorted term order, so one binary search finds them all
+        positions = np.searchsorted(self.terms, grams) if len(grams) else np.empty(0, dtype=np.int64)
+        positions[positions == n_terms] = 0
+        found = self.terms[positions] == grams if len(grams) else np.empty(0, dtype=bool)
+        rows = np.repeat(np.arange(len(texts)), lengths)[found]
+
+        # Count each (row, column) pair; unique keys come back in CSR order
+        keys, counts = np.unique(rows * n_terms + positions[found], return_counts=True)
+        rows, columns = keys // n_terms, keys % n_terms
+
+        weights = counts.astype(np.float64)
+        if self.params['sublinear_tf']:
+            weights = np.log(weights) + 1.0
+        if self.params['use_idf']:
+            weights *= self.idf[columns]
+        if self.params['norm'] == 'l2':
+            row_norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(texts)))
+            weights /= row_norms[rows]
+        elif self.params['norm'] == 'l1':
+            row_norms = np.bincount(rows, np.abs(weights), minlength=len(texts))
+            weights /= row_norms[rows]
+
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(texts)))])
+        return sparse.csr_matrix((weights, columns, indptr), shape=(len(texts), n_terms))
+
+class CompactMultinomialNB:
+    """MultinomialNB.predict_proba from stored log probabilities."""
+
+    def __init__(self, classes: np.ndarray, class_log_prior: np.ndarray,
+                 feature_log_prob: np.ndarray):
+        self.classes_ = classes
+        self.class_log_prior = class_log_prior
+        self.feature_log_prob = feature_log_prob
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Normalized class probabilities per row."""
+        # Gather only the columns present, so a query touches a few mapped pages
+        # instead of the whole matrix
+        X = sparse.csr_matrix(X)
+        joint = dot_gathered(X, self.feature_log_prob[:, X.indices]) + self.class_log_prior
+        return softmax(joint)
+
+    def predict(self, X) -> np.ndarray:
+        """Most probable class per row."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+class CompactLinearClassifier:
+    """Softmax over a linear model: all class probabilities from one product."""
+
+    def __init__(self, classes: np.ndarray, coef: np.ndarray, intercept: np.ndarray):
+        self.classes_ = classes
+        self.coef = coef
+        self.intercept = intercept
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Normalized class probabilities per row."""
+        X = sparse.csr_matrix(X)
+        return softmax(dot_gathered(X, self.coef[:, X.indices]) + self.intercept)
+
+    def predict(self, X) -> np.ndarray:
+        """Most probable class per row."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+class FeaturePipeline:
+    """The slice of the sklearn Pipeline API the models use: a vectorizer and a classifier."""
+
+    def __init__(self, vectorizer, classifier):
+        self.steps = [vectorizer, classifier]
+
+    def __getitem__(self, index):
+        """pipeline[:-1] is the vectorizer and pipeline[-1] the classifier, as in sklearn."""
+        if isinstance(index, slice):
+            steps = self.steps[index]
+            return steps[0] if len(steps) == 1 else self
+        return self.steps[index]
+
+    @property
+    def classes_(self) -> np.ndarray:
+        """Class labels in probability column order."""
+        return self.steps[-1].classes_
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Class probabilities for texts."""
+        return self.steps[-1].predict_proba(self.steps[0].transform(texts))
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        """Most probable class for texts."""
+        return self.steps[-1].predict(self.steps[0].transform(texts))
+
+    def score(self, texts: List[str], labels: List[str]) -> float:
+        """Accuracy on labelled texts."""
+        return float(np.mean(self.predict(texts) == np.asarray(labels, dtype=str)))
+
+class CompactPipeline(FeaturePipeline):
+    """A FeaturePipeline over mapped arrays, keeping them for re-export."""
+
+    def __init__(self, vectorizer: CompactTfidfVectorizer, classifier: CompactMultinomialNB,
+                 arrays: Dict[str, np.ndarray], meta: dict):
+        super().__init__(vectorizer, classifier)
+        self.arrays = arrays
+        self.meta = meta
+
+def export_vectorizer(vectorizer: TfidfVectorizer) -> Dict[str, np.ndarray]:
+    """Sorted terms and idf weights of a fitted TfidfVectorizer."""
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    if terms != sorted(terms):
+        raise ValueError("Vocabulary columns are not in sorted term order")
+    return {'terms': np.array(terms, dtype=str), 'idf': vectorizer.idf_.astype(np.float32)}
+
+def export_classifier(classifier) -> Dict[str, np.ndarray]:
+    """Arrays for a fitted MultinomialNB or multinomial LogisticRegression."""
+    if isinstance(classifier, CompactLinearClassifier):
+        return {'classes': classifier.classes_, 'coef': classifier.coef,
+                'intercept': classifier.intercept}
+    if isinstance(classifier, LogisticRegression):
+        coef, intercept = classifier.coef_, classifier.intercept_
+        if len(classifier.classes_) == 2:
+            # One binary row; as two rows the softmax equals the sigmoid
+            coef, intercept = np.vstack([-coef, coef]) / 2, np.array([-intercept[0], intercept[0]]) / 2
+        return {
+            'classes': np.array(classifier.classes_, dtype=str),
+            'coef': coef.astype(np.float32),
+            'intercept': intercept.astype(np.float32)
+        }
+    if isinstance(classifier, CompactMultinomialNB):
+        return {
+            'classes': classifier.classes_,
+            'class_log_prior': classifier.class_log_prior,
+            'feature_log_prob': classifier.feature_log_prob
+        }
+    if not isinstance(classifier, MultinomialNB):
+        raise ValueError("Only MultinomialNB and LogisticRegression classifiers can be exported")
+    return {
+        'classes': np.array(classifier.classes_, dtype=str),
+        'class_log_prior': classifier.class_log_prior_.astype(np.float32),
+        'feature_log_prob': classifier.feature_log_prob_.astype(np.float32)
+    }
+
+def load_classifier(arrays: Dict[str, np.ndarray]):
+    """Rebuild an exported classifier on top of its arrays."""
+    if 'coef' in arrays:
+        return CompactLinearClassifier(arrays['classes'], arrays['coef'], arrays['intercept'])
+    return CompactMultinomialNB(
+        arrays['classes'], arrays['class_log_prior'], arrays['feature_log_prob']
+    )
+
+def export_pipeline(pipeline) -> Tuple[Dict[str, np.ndarray], dict]:
+    """Arrays and metadata for a fitted TF-IDF + MultinomialNB pipeline."""
+    if isinstance(pipeline, CompactPipeline):
+        return pipeline.arrays, pipeline.meta
+    if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+        raise ValueError("Only two-step vectorizer/classifier pipelines can be exported")
+
+    vectorizer, classifier = pipeline[0], pipeline[-1]
+    if not isinstance(vectorizer, TfidfVectorizer):
+        raise ValueError("Only TfidfVectorizer pipelines can be exported")
+    if (vectorizer.analyzer != 'word' or vectorizer.preprocessor or vectorizer.tokenizer
+            or vectorizer.stop_words):
+        raise ValueError("Custom analyzers cannot be exported")
+
+    arrays = dict(export_classifier(classifier), **export_vectorizer(vectorizer))
+    meta = {'format': 1, 'vectorizer': {
+        name: getattr(vectorizer, name) for name in _VECTORIZER_PARAMS
+    }}
+    return arrays, meta
+
+def load_pipeline(arrays: Dict[str, np.ndarray], meta: dict) -> CompactPipeline:
+    """Rebuild an exported pipeline on top of (typically memory-mapped) arrays."""
+    vectorizer = CompactTfidfVectorizer(arrays['terms'], arrays['idf'], meta['vectorizer'])
+    return CompactPipeline(vectorizer, load_classifier(arrays), arrays, meta)
@@ -1,53 +1,121 @@
 import pickle
-import numpy as np
-from textblob import TextBlob
+from functools import partial
+from typing import List
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
 from sklearn.pipeline import Pipeline
 import cv2
 from config import Config
+from models.compact import (CompactTfidfVectorizer, FeaturePipeline, export_classifier,
+                            export_vectorizer, load_arrays, load_classifier, save_arrays)
+from models.features import SharedFeaturizer, SharedFeatures, analyze
+from models.registry import compute_fingerprint, save_artifact
+from utils import text_processing
+from utils.cache import LRUCache, MISSING
+from utils.text_processing import normalize, tokenize
 
 class EmotionDetector:
-    def __init__(self):
+    HYPERPARAMETERS = {
+        'tfidf': {'max_features': 1000, 'ngram_range': (1, 2)},
+        'classifier': {'probability': True, 'kernel': 'linear'},
+        'linear': {'C': 10.0, 'max_iter': 1000}
+    }
+    
+    def __init__(self, featurizer: SharedFeaturizer = None):
         self.text_pipeline = None
+        self.featurizer = featurizer
         self.emotion_labels = ['joy', 'sadness', 'anger', 'fear', 'surprise', 'neutral']
+        
+        # TextBlob reads punctuation and case, so keys only collapse whitespace
+        self.prediction_cache = LRUCache(Config.PREDICTION_CACHE_SIZE)
         self.load_model()
     
-    def detect_text_emotion(self, text: str) -> tuple:
-        """Detect emotion from text."""
-        # Use TextBlob for basic sentiment analysis
-        blob = TextBlob(text)
-        polarity = blob.sentiment.polarity
-        subjectivity = blob.sentiment.subjectivity
+    def _sentiment_emotion(self, text: str) -> tuple:
+        """Emotion and confidence from TextBlob polarity and subjectivity."""
+        # Imported on first use, since TextBlob pulls in NLTK
+        from textblob import TextBlob
+        sentiment = TextBlob(text).sentiment
+        polarity = sentiment.polarity
+        subjectivity = sentiment.subjectivity
         
         # Map polarity to emotion
         if polarity > 0.3:
-            emotion = "joy"
-            confidence = min(polarity * 2, 1.0)
+            return "joy", min(polarity * 2, 1.0)
         elif polarity < -0.3:
-            emotion = "sadness"
-            confidence = min(abs(polarity) * 2, 1.0)
+            return "sadness", min(abs(polarity) * 2, 1.0)
         elif subjectivity > 0.7:
-            emotion = "surprise"
-            confidence = subjectivity
+            return "surprise", subjectivity
+        else:
+            return "neutral", 0.7
+    
+    def detect_text_emotion(self, text: str, features: SharedFeatures = None) -> tuple:
+        """Detect emotion from text, reusing shared `features` of it when they fit the model."""
+        return self.detect_text_emotions([text], features)[0]
+    
+    def detect_text_emotions(self, texts: List[str], features: SharedFeatures = None) -> List[tuple]:
+        """Detect emotions for a batch of texts in one vectorize/predict_proba pass.
+        
+        Returns one (emotion, confidence) tuple per text. The model's label and
+        confidence come from the same probability row; with Config.EMOTION_TEXTBLOB
+        the TextBlob estimate is used wherever it is more confident.
+        """
+        keys = [' '.join(text.split()) for text in texts]
+        entries = [self.prediction_cache.get(key) for key in keys]
+        misses = sorted({key for key, entry in zip(keys, entries) if entry is MISSING})
+        if not misses:
+            return [entry[1] for entry in entries]
+        
+        # Version before pipeline: a retrain swaps the pipeline, then clears
+        version = self.prediction_cache.version
+        pipeline = self.text_pipeline
+        
+        if Config.EMOTION_TEXTBLOB:
+            estimates = [self._sentiment_emotion(key) for key in misses]
         else:
-            emotion = "neutral"
-            confidence = 0.7
+            estimates = [("neutral", 0.0 if pipeline else 0.7)] * len(misses)
         
         # If we have a trained model, use it for better accuracy
-        if self.text_pipeline:
+        rows, probabilities = None, None
+        if pipeline:
             try:
-                predicted_emotion = self.text_pipeline.predict([text])[0]
-                confidence_scores = self.text_pipeline.predict_proba([text])[0]
-                max_confidence = max(confidence_scores)
-                
-                if max_confidence > confidence:
-                    emotion = predicted_emotion
-                    confidence = max_confidence
+                if features is not None and features.vectorizer is pipeline[0]:
+                    positions = {key: row for row, key in enumerate(keys)}
+                    rows = features.matrix[[positions[key] for key in misses]]
+                else:
+                    # Always a 2-D matrix, so rows[index] is one row for any batch size
+                    rows = sparse.csr_matrix(pipeline[:-1].transform(misses))
+                probabilities = pipeline[-1].predict_proba(rows)
             except Exception as e:
+                # Heuristic answers only, and not cached
                 print(f"Error using trained emotion model: {e}")
+                computed = dict(zip(misses, estimates))
+                return [computed[key] if entry is MISSING else entry[1]
+                        for key, entry in zip(keys, entries)]
         
-        return emotion, confidence
+        computed = {}
+        for index, key in enumerate(misses):
+            emotion, confidence = estimates[index]
+            row = None
+            if probabilities is not None:
+                row = rows[index]
+                best = int(probabilities[index].argmax())
+                if probabilities[index, best] > confidence:
+                    emotion = str(pipeline.classes_[best])
+                    confidence = float(probabilities[index, best])
+            computed[key] = (row, (emotion, confidence))
+            self.prediction_cache.put(key, computed[key], version)
+        return [computed[key][1] if entry is MISSING else entry[1]
+                for key, entry in zip(keys, entries)]
+    
+    def cache_stats(self) -> dict:
+        """Hit/miss/eviction counters for the prediction cache."""
+        return self.prediction_cache.stats()
+    
+    def _clear_prediction_cache(self):
+        """Drop predictions made by the pipeline that was just replaced."""
+        self.prediction_cache.clear()
     
     def detect_face_emotion(self, frame) -> tuple:
         """Detect emotion from facial expression."""
@@ -83,28 +151,126 @@ class EmotionDetector:
                 texts.append(example)
                 labels.append(emotion)
         
-        # Create pipeline
-        self.text_pipeline = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=1000, ngram_range=(1, 2))),
-            ('classifier', SVC(probability=True, kernel='linear'))
-        ])
-        
-        # Train model
-        self.text_pipeline.fit(texts, labels)
+        # Build and fit a new pipeline; the current one keeps serving until the swap
+        params = self.HYPERPARAMETERS
+        if Config.EMOTION_ENGINE == 'linear':
+            pipeline = self._train_linear_model(texts, labels)
+        elif self.featurizer:
+            # Only the classifier is fitted; the vocabulary belongs to the featurizer
+            vectorizer = self.featurizer.vectorizer
+            classifier = SVC(**params['classifier'])
+            classifier.fit(vectorizer.transform(texts), labels)
+            pipeline = FeaturePipeline(vectorizer, classifier)
+        else:
+            pipeline = Pipeline([
+                ('tfidf', TfidfVectorizer(**params['tfidf'], preprocessor=normalize,
+                                          tokenizer=tokenize, token_pattern=None)),
+                ('classifier', SVC(**params['classifier']))
+            ])
+            pipeline.fit(texts, labels)
+        self.text_pipeline = pipeline
+        self._clear_prediction_cache()
         
         # Save model
         self.save_model()
     
+    def _train_linear_model(self, texts: List[str], labels: List[str]) -> FeaturePipeline:
+        """Logistic regression, served from the same float32 arrays a later load maps."""
+        params = self.HYPERPARAMETERS
+        if self.featurizer:
+            vectorizer = self.featurizer.vectorizer
+        else:
+            fitted = TfidfVectorizer(
+                analyzer=partial(analyze, ngram_range=params['tfidf']['ngram_range'], lemmatize=False),
+                max_features=params['tfidf']['max_features']
+            )
+            fitted.fit(texts)
+            vectorizer = self._linear_vectorizer(export_vectorizer(fitted))
+        
+        classifier = LogisticRegression(**params['linear'])
+        classifier.fit(vectorizer.transform(texts), labels)
+        return FeaturePipeline(vectorizer, load_classifier(export_classifier(classifier)))
+    
+    def _linear_vectorizer(self, arrays: dict) -> CompactTfidfVectorizer:
+        """The linear engine's own vocabulary: raw (not lemmatized) unigrams and bigrams."""
+        analyzer = partial(analyze, ngram_range=self.HYPERPARAMETERS['tfidf']['ngram_range'],
+                           lemmatize=False)
+        return CompactTfidfVectorizer(arrays['terms'], arrays['idf'],
+                                      {'norm': 'l2', 'use_idf': True, 'sublinear_tf': False},
+                                      analyzer=analyzer)
+    
+    @property
+    def model_path(self):
+        """Artifact the active engine saves to."""
+        if Config.EMOTION_ENGINE == 'linear':
+            return Config.EMOTION_LINEAR_MODEL_PATH
+        return Config.EMOTION_MODEL_PATH
+    
+    def fingerprint(self, training_data: dict) -> str:
+        """Registry fingerprint of the model train_text_emotion_model would build."""
+        hyperparameters = dict(self.HYPERPARAMETERS, engine=Config.EMOTION_ENGINE)
+        if self.featurizer:
+            hyperparameters['shared_features'] = self.featurizer.trained_on
+        return compute_fingerprint(training_data, hyperparameters,
+                                   [__file__, text_processing.__file__])
+    
     def save_model(self):
         """Save the emotion model."""
-        if self.text_pipeline:
-            with open(Config.EMOTION_MODEL_PATH, 'wb') as f:
-                pickle.dump(self.text_pipeline, f)
+        if not self.text_pipeline:
+            return
+        if Config.EMOTION_ENGINE == 'linear':
+            arrays = export_classifier(self.text_pipeline[-1])
+            if not self.featurizer:
+                vectorizer = self.text_pipeline[0]
+                arrays.update(terms=vectorizer.terms, idf=vectorizer.idf)
+            meta = {
+                'format': 1,
+                'shared_features': self.featurizer.trained_on if self.featurizer else None
+            }
+            save_arrays(Config.EMOTION_LINEAR_MODEL_PATH, arrays, meta)
+        elif self.featurizer:
+            # The vocabulary is saved by the featurizer; keep only the classifier
+            save_artifact(Config.EMOTION_MODEL_PATH, {
+                'classifier': self.text_pipeline[-1],
+                'shared_features': self.featurizer.trained_on
+            })
+        else:
+            save_artifact(Config.EMOTION_MODEL_PATH, self.text_pipeline)
     
     def load_model(self):
         """Load the emotion model."""
         try:
+            if Config.EMOTION_ENGINE == 'linear':
+                self.text_pipeline = self._load_linear_model()
+                self._clear_prediction_cache()
+                return
             with open(Config.EMOTION_MODEL_PATH, 'rb') as f:
-                self.text_pipeline = pickle.load(f)
+                saved = pickle.load(f)
+            if self.featurizer:
+                # The classifier's columns only mean something under the vocabulary it saw
+                if (not isinstance(saved, dict) or self.featurizer.vectorizer is None
+                        or saved['shared_features'] != self.featurizer.trained_on):
+                    raise ValueError("Saved model was trained on a different feature vocabulary")
+                saved = FeaturePipeline(self.featurizer.vectorizer, saved['classifier'])
+            elif isinstance(saved, dict):
+                raise ValueError("Saved model needs the shared featurizer")
+            self.text_pipeline = saved
+            self._clear_prediction_cache()
         except FileNotFoundError:
-            print("No trained emotion model found.")
\ No newline at end of file
+            print("No trained emotion model found.")
+        except ValueError as e:
+            print(f"Error loading emotion model: {e}")
+    
+    def _load_linear_model(self) -> FeaturePipeline:
+        """Map the linear engine's arrays."""
+        arrays, meta = load_arrays(Config.EMOTION_LINEAR_MODEL_PATH)
+        if self.featurizer:
+            if (self.featurizer.vectorizer is None
+                    or meta['shared_features'] != self.featurizer.trained_on):
+                raise ValueError("Saved model was trained on a different feature vocabulary")
+            vectorizer = self.featurizer.vectorizer
+        elif meta['shared_features'] is not None:
+            raise ValueError("Saved model needs the shared featurizer")
+        else:
+            vectorizer = self._linear_vectorizer(arrays)
+        return FeaturePipeline(vectorizer, load_classifier(arrays))
\ No newline at end of file
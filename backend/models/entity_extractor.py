@@ -0,0 +1,161 @@
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+_MONTHS = "january|february|march|april|may|june|july|august|september|october|november|december"
+
+class EntitySpan(NamedTuple):
+    entity_type: str
+    value: str  # Canonical value for keywords, the matched text for patterns
+    text: str
+    start: int  # Offsets into text.lower()
+    end: int
+    priority: int  # Registration order within the entity type; lower wins
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex matching any of `words`, factored into a prefix trie.
+
+    Each position then branches on at most one alternative per distinct next
+    character, so matching cost does not grow with the number of words, and
+    optional tails make the longest word win.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if '' in node else body
+
+    return build(trie)
+
+class EntityExtractor:
+    """Typed entity spans from one pass of a single compiled regex per intent.
+
+    Entity types are registered as regex patterns or as literal keywords,
+    optionally limited to some intents. All patterns active for an intent
+    become named alternatives of one regex; all keywords become one trie
+    alternative. The combination is compiled on first use and cached.
+    At most one span starts at each offset: patterns in registration order,
+    then the longest keyword.
+    """
+
+    def __init__(self):
+        self._patterns = []  # (entity_type, pattern, priority, intents)
+        self._keywords = []  # (entity_type, keyword, value, priority, intents)
+        self._priorities = {}
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def _next_priority(self, entity_type: str) -> int:
+        """Registration index within an entity type."""
+        priority = self._priorities.get(entity_type, 0)
+        self._priorities[entity_type] = priority + 1
+        return priority
+
+    def register_pattern(self, entity_type: str, pattern: str, intents: Iterable[str] = None):
+        """Add a regex (matched against lowercased text) for an entity type."""
+        re.compile(pattern)
+        with self._lock:
+            self._patterns.append((entity_type, pattern, self._next_priority(entity_type),
+                                   frozenset(intents) if intents else None))
+            self._compiled.clear()
+
+    def register_keywords(self, entity_type: str, keywords: Union[List[str], Dict[str, str]],
+                          intents: Iterable[str] = None):
+        """Add literal keywords for an entity type, in priority order.
+
+        A dict maps each keyword to the canonical value its spans report.
+        Keywords match anywhere, including inside longer words.
+        """
+        if not isinstance(keywords, dict):
+            keywords = {keyword: keyword for keyword in keywords}
+        with self._lock:
+            for keyword, value in keywords.items():
+                self._keywords.append((entity_type, keyword.lower(), value,
+                                       self._next_priority(entity_type),
+                                       frozenset(intents) if intents else None))
+            self._compiled.clear()
+
+    def _compile(self, intent: Optional[str]) -> tuple:
+        """Combined regex, group -> (type, priority), keyword -> [(type, value, priority)]."""
+        with self._lock:
+            compiled = self._compiled.get(intent)
+            if compiled:
+                return compiled
+
+            alternatives, groups = [], {}
+            for index, (entity_type, pattern, priority, intents) in enumerate(self._patterns):
+                if intents is None or intent in intents:
+                    groups[f"p{index}"] = (entity_type, priority)
+                    alternatives.append(f"(?P<p{index}>{pattern})")
+
+            keyword_entries = {}
+            for entity_type, keyword, value, priority, intents in self._keywords:
+                if intents is None or intent in intents:
+                    keyword_entries.setdefault(keyword, []).append((entity_type, value, priority))
+            if keyword_entries:
+                alternatives.append(f"(?P<kw>{_trie_pattern(keyword_entries)})")
+
+            # Inside a lookahead the scan advances one character at a time,
+            # so spans may overlap (a date inside a longer date still shows up)
+            regex = re.compile(f"(?=(?:{'|'.join(alternatives)}))") if alternatives else None
+            compiled = (regex, groups, keyword_entries)
+            self._compiled[intent] = compiled
+            return compiled
+
+    def extract(self, text: str, intent: str = None) -> List[EntitySpan]:
+        """All entity spans active for `intent`, left to right."""
+        regex, groups, keyword_entries = self._compile(intent)
+        if regex is None:
+            return []
+
+        spans = []
+        for match in regex.finditer(text.lower()):
+            group = match.lastgroup
+            matched, start, end = match.group(group), match.start(group), match.end(group)
+            if group == 'kw':
+                for entity_type, value, priority in keyword_entries[matched]:
+                    spans.append(EntitySpan(entity_type, value, matched, start, end, priority))
+            else:
+                entity_type, priority = groups[group]
+                spans.append(EntitySpan(entity_type, matched, matched, start, end, priority))
+        return spans
+
+    @staticmethod
+    def best(spans: List[EntitySpan], entity_type: str) -> Optional[EntitySpan]:
+        """Highest-priority span of a type, earliest first among equals."""
+        candidates = [span for span in spans if span.entity_type == entity_type]
+        return min(candidates, key=lambda span: (span.priority, span.start)) if candidates else None
+
+def build_default_extractor() -> EntityExtractor:
+    """Extractor with Eric's built-in entity types."""
+    extractor = EntityExtractor()
+
+    # Dates, most specific format first
+    for pattern in (
+        r'\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4}',
+        rf'(?:{_MONTHS})\s+\d{{1,2}}',
+        rf'\d{{1,2}}\s+(?:{_MONTHS})',
+        r'today|tomorrow|next week|next month'
+    ):
+        extractor.register_pattern('date', pattern, intents=['remember_event'])
+
+    # Text after these keywords is the entity's content
+    extractor.register_keywords('event_marker', ['remember', 'remind', 'event', 'appointment'],
+                                intents=['remember_event'])
+    extractor.register_keywords('fact_marker', ["remember that", "remember", "don't forget", "save this"],
+                                intents=['remember_fact'])
+    extractor.register_keywords('music_marker', ['play', 'song', 'music', 'artist'],
+                                intents=['play_music'])
+    extractor.register_keywords('music_action', {
+        'next': 'next', 'skip': 'next', 'previous': 'previous', 'back': 'previous',
+        'pause': 'pause', 'stop': 'stop'
+    }, intents=['play_music'])
+    return extractor
@@ -0,0 +1,210 @@
+import threading
+from typing import List, Optional, Tuple
+import numpy as np
+from config import Config
+
+def squared_distances(queries: np.ndarray, encodings: np.ndarray, norms: np.ndarray) -> np.ndarray:
+    """(Q, N) squared euclidean distances from one matrix product, given ||e||^2 per row."""
+    queries = np.asarray(queries, dtype=np.float32)
+    # Gallery-major product: BLAS streams the large matrix row by row
+    products = (encodings @ queries.T).T
+    squared = (np.einsum('ij,ij->i', queries, queries)[:, np.newaxis] + norms[np.newaxis, :]
+               - 2.0 * products)
+    return np.maximum(squared, 0.0, out=squared)
+
+class ExactIndex:
+    """Brute force over the whole gallery; right for up to a few thousand identities."""
+
+    def build(self, encodings: np.ndarray, norms: np.ndarray):
+        """Nothing to build."""
+
+    def needs_rebuild(self, size: int) -> bool:
+        """Never; every search scans the gallery as it is."""
+        return False
+
+    def search(self, queries: np.ndarray, encodings: np.ndarray,
+               norms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest row and its squared distance per query."""
+        squared = squared_distances(queries, encodings, norms)
+        nearest = squared.argmin(axis=1)
+        return nearest, squared[np.arange(len(queries)), nearest]
+
+class PartitionedIndex:
+    """Inverted-file index for large galleries.
+
+    k-means splits the gallery into about sqrt(N) cells; a search scores the
+    query against the cell centroids and then only the rows of the
+    `n_probes` nearest cells, so cost grows with sqrt(N) rather than N.
+    Rows enrolled after the last build are scanned exactly until enough of
+    them accumulate to warrant a rebuild.
+    """
+
+    def __init__(self, n_probes: int = None, iterations: int = 10, seed: int = 0):
+        self.n_probes = n_probes or Config.FACE_INDEX_PROBES
+        self.iterations = iterations
+        self.seed = seed
+        # (centroids, centroid norms, rows ordered by cell, cell offsets, rows covered)
+        self._state = None
+
+    def build(self, encodings: np.ndarray, norms: np.ndarray):
+        """Cluster the gallery into cells."""
+        size = len(encodings)
+        if size == 0:
+            self._state = None
+            return
+        rng = np.random.default_rng(self.seed)
+        n_cells = max(1, int(np.sqrt(size)))
+
+        # Lloyd iterations on a sample; enough rows per cell to place it well
+        sample = encodings[np.sort(rng.choice(size, min(size, n_cells * 64), replace=False))]
+        centroids = sample[rng.choice(len(sample), n_cells, replace=False)].copy()
+        for _ in range(self.iterations):
+            centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+            assignment = squared_distances(sample, centroids, centroid_norms).argmin(axis=1)
+            counts = np.bincount(assignment, minlength=n_cells)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignment = np.empty(size, dtype=np.int64)
+        for start in range(0, size, 8192):
+            block = slice(start, start + 8192)
+            assignment[block] = squared_distances(encodings[block], centroids, centroid_norms).argmin(axis=1)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(n_cells + 1))
+        self._state = (centroids, centroid_norms, order, offsets, size)
+
+    def needs_rebuild(self, size: int) -> bool:
+        """True once unindexed rows exceed a quarter of the indexed ones."""
+        state = self._state
+        return state is None or size - state[-1] > max(state[-1] // 4, 64)
+
+    def search(self, queries: np.ndarray, encodings: np.ndarray,
+               norms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest row among the probed cells and the unindexed tail, per query."""
+        state = self._state
+        if state is None:
+            return ExactIndex().search(queries, encodings, norms)
+        centroids, centroid_norms, order, offsets, indexed = state
+        queries = np.asarray(queries, dtype=np.float32)
+        n_probes = min(self.n_probes, len(centroids))
+
+        cell_distances = squared_distances(queries, centroids, centroid_norms)
+        probes = np.argpartition(cell_distances, n_probes - 1, axis=1)[:, :n_probes]
+        # The index may have been rebuilt for a larger gallery than this snapshot
+        size = len(encodings)
+        tail = np.arange(min(indexed, size), size)
+
+        nearest = np.zeros(len(queries), dtype=np.int64)
+        distances = np.full(len(queries), np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate(
+                [order[offsets[cell]:offsets[cell + 1]] for cell in probes[row]] + [tail]
+            )
+            if indexed > size:
+                candidates = candidates[candidates < size]
+            if len(candidates) == 0:
+                continue
+            squared = squared_distances(query[np.newaxis], encodings[candidates], norms[candidates])[0]
+            best = int(squared.argmin())
+            nearest[row], distances[row] = candidates[best], squared[best]
+        return nearest, distances
+
+class FaceGallery:
+    """Enrolled face encodings for fast matching.
+
+    Encodings live in a preallocated contiguous float32 matrix that doubles
+    when full, next to their cached squared norms, so matching every face in
+    a frame is one matrix product (or one per probed cell). Enrollment writes
+    the next free row and then publishes the new size, so searches running
+    concurrently only ever see complete rows.
+    """
+
+    def __init__(self, dimensions: int = 128, index=None):
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        # (encodings, norms, names, size); replaced as one reference
+        self._state = self._allocate(Config.FACE_GALLERY_CAPACITY, [], 0)
+        self._fixed_index = index is not None
+        self.index = index or ExactIndex()
+
+    def _allocate(self, capacity: int, names: List[str], size: int) -> tuple:
+        """Empty buffers of a capacity, with the first `size` rows to be filled by the caller."""
+        return (np.empty((capacity, self.dimensions), dtype=np.float32),
+                np.empty(capacity, dtype=np.float32), names, size)
+
+    def __len__(self) -> int:
+        return self._state[3]
+
+    @property
+    def encodings(self) -> np.ndarray:
+        """View of the enrolled rows."""
+        encodings, _, _, size = self._state
+        return encodings[:size]
+
+    @property
+    def names(self) -> List[str]:
+        """Names of the enrolled rows, in row order."""
+        _, _, names, size = self._state
+        return names[:size]
+
+    def add(self, encodings: np.ndarray, names: List[str]):
+        """Enroll one or more encodings."""
+        with self._lock:
+            self._publish(self._state, encodings, names)
+
+    def replace(self, encodings: np.ndarray, names: List[str]):
+        """Drop every enrolled row and enroll these instead."""
+        with self._lock:
+            if not self._fixed_index:
+                self.index = ExactIndex()
+            state = self._allocate(max(Config.FACE_GALLERY_CAPACITY, len(names)), [], 0)
+            # Every indexed row is gone, however the size compares
+            self._publish(state, encodings, names, rebuild=True)
+
+    def _publish(self, state: tuple, encodings: np.ndarray, names: List[str], rebuild: bool = False):
+        """Write rows after the last one of `state`, then publish the new size (lock held)."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dimensions)
+        current, norms, current_names, size = state
+        needed = size + len(encodings)
+        if needed > len(current):
+            # Grow by doubling; searches in flight keep the old buffers
+            capacity = max(needed, 2 * len(current))
+            grown, grown_norms, _, _ = self._allocate(capacity, [], 0)
+            grown[:size], grown_norms[:size] = current[:size], norms[:size]
+            current, norms = grown, grown_norms
+
+        current[size:needed] = encodings
+        norms[size:needed] = np.einsum('ij,ij->i', encodings, encodings)
+        # Readers never look past their own size, so names can be appended in place
+        current_names.extend(names)
+        self._state = (current, norms, current_names, needed)
+        self._update_index(needed, rebuild)
+
+    def _update_index(self, size: int, rebuild: bool = False):
+        """Pick the index for the gallery size and rebuild it when it falls behind or is stale."""
+        if not self._fixed_index:
+            partitioned = (Config.FACE_INDEX == 'partitioned' or
+                           (Config.FACE_INDEX == 'auto' and size >= Config.FACE_INDEX_PARTITION_THRESHOLD))
+            wanted = PartitionedIndex if partitioned else ExactIndex
+            if not isinstance(self.index, wanted):
+                self.index = wanted()
+        if rebuild or self.index.needs_rebuild(size):
+            encodings, norms, _, _ = self._state
+            self.index.build(encodings[:size], norms[:size])
+
+    def match(self, queries: np.ndarray, tolerance: float) -> List[Tuple[Optional[str], float]]:
+        """(name, distance) of the nearest enrolled face per query; name is None beyond tolerance."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimensions)
+        encodings, norms, names, size = self._state
+        if size == 0 or len(queries) == 0:
+            return [(None, float('inf')) for _ in queries]
+
+        nearest, squared = self.index.search(queries, encodings[:size], norms[:size])
+        results = []
+        for index, distance in zip(nearest, np.sqrt(squared)):
+            name = names[index] if distance <= tolerance else None
+            results.append((name, float(distance)))
+        return results
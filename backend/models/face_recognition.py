@@ -3,19 +3,39 @@ import cv2
 import numpy as np
 import pickle
 from config import Config
+from core.face_store import FaceEncodingStore
+from models.compact import load_arrays
+from models.face_gallery import FaceGallery
+from models.face_tracker import FaceTracker
 import os
 
 class FaceRecognitionSystem:
     def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
+        # Encodings persist in the database; the gallery matches against them
+        self.store = FaceEncodingStore()
+        self.gallery = FaceGallery()
+        # Continuous authentication follows faces instead of re-encoding them
+        self.tracker = FaceTracker(face_recognition.face_locations,
+                                   face_recognition.face_encodings, self._match)
+        self._import_legacy_encodings()
         self.load_face_encodings()
     
-    def register_face(self, image_path: str, user_name: str) -> bool:
-        """Register a new face."""
+    @property
+    def known_face_encodings(self) -> np.ndarray:
+        """N x 128 float32 view of the enrolled encodings."""
+        return self.gallery.encodings
+    
+    @property
+    def known_face_names(self) -> list:
+        """Enrolled names, in encoding order."""
+        return self.gallery.names
+    
+    def register_face(self, image, user_name: str, replace_existing: bool = False) -> bool:
+        """Register a new face from an image path or RGB array, optionally replacing the name's faces."""
         try:
             # Load image
-            image = face_recognition.load_image_file(image_path)
+            if isinstance(image, (str, os.PathLike)):
+                image = face_recognition.load_image_file(image)
             
             # Get face encodings
             face_encodings = face_recognition.face_encodings(image)
@@ -24,12 +44,15 @@ class FaceRecognitionSystem:
                 # Use the first face found
                 face_encoding = face_encodings[0]
                 
-                # Add to known faces
-                self.known_face_encodings.append(face_encoding)
-                self.known_face_names.append(user_name)
+                # One appended row; the database serializes concurrent enrollments
+                self.store.add(user_name, [face_encoding], replace=replace_existing)
                 
-                # Save encodings
-                self.save_face_encodings()
+                # Add to known faces
+                if replace_existing:
+                    self.load_face_encodings()
+                else:
+                    self.gallery.add(face_encoding, [user_name])
+                    self.tracker.reset()
                 
                 return True
             else:
@@ -40,70 +63,91 @@ class FaceRecognitionSystem:
             print(f"Error registering face: {e}")
             return False
     
-    def authenticate_face(self, frame) -> tuple:
-        """Authenticate face from camera frame."""
+    def authenticate_face(self, frame, rgb: bool = False) -> tuple:
+        """Authenticate face from a BGR camera frame (RGB with `rgb`)."""
         try:
-            # Convert BGR to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if Config.FACE_TRACKING:
+                # Identities carried over from earlier frames while the faces stay tracked
+                faces = self.tracker.update(frame, rgb)
+                face_locations = [face.location for face in faces]
+                matches = [(face.name, face.distance) for face in faces]
+            else:
+                # Convert BGR to RGB
+                rgb_frame = frame if rgb else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                
+                # Find face locations and encodings
+                face_locations = face_recognition.face_locations(rgb_frame)
+                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+                matches = self._match(np.array(face_encodings)) if face_encodings else []
             
-            # Find face locations and encodings
-            face_locations = face_recognition.face_locations(rgb_frame)
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            if not matches:
+                return "No face detected", 0.0, []
             
-            for face_encoding in face_encodings:
-                # Compare with known faces
-                matches = face_recognition.compare_faces(
-                    self.known_face_encodings, 
-                    face_encoding, 
-                    tolerance=Config.FACE_RECOGNITION_TOLERANCE
-                )
-                
-                name = "Unknown"
-                confidence = 0.0
-                
-                if True in matches:
-                    # Find the best match
-                    face_distances = face_recognition.face_distance(
-                        self.known_face_encodings, face_encoding
-                    )
-                    best_match_index = np.argmin(face_distances)
-                    
-                    if matches[best_match_index]:
-                        name = self.known_face_names[best_match_index]
-                        confidence = 1.0 - face_distances[best_match_index]
-                
-                return name, confidence, face_locations
+            # The closest recognized face in the frame authenticates
+            recognized = [(distance, name) for name, distance in matches if name is not None]
+            if recognized:
+                distance, name = min(recognized)
+                return name, 1.0 - distance, face_locations
             
-            return "No face detected", 0.0, []
+            return "Unknown", 0.0, face_locations
             
         except Exception as e:
             print(f"Error authenticating face: {e}")
             return "Error", 0.0, []
     
-    def save_face_encodings(self):
-        """Save face encodings to file."""
+    def _match(self, encodings: np.ndarray) -> list:
+        """Every encoding against the gallery in one batch."""
+        return self.gallery.match(encodings, tolerance=Config.FACE_RECOGNITION_TOLERANCE)
+    
+    def delete_user(self, user_name: str) -> bool:
+        """Forget every face registered under a name."""
         try:
-            data = {
-                'encodings': self.known_face_encodings,
-                'names': self.known_face_names
-            }
-            
-            os.makedirs(Config.MODEL_DIR, exist_ok=True)
-            with open(Config.FACE_ENCODINGS_PATH, 'wb') as f:
-                pickle.dump(data, f)
-                
+            if self.store.delete_user(user_name) == 0:
+                return False
+            self.load_face_encodings()
+            return True
         except Exception as e:
-            print(f"Error saving face encodings: {e}")
+            print(f"Error deleting face encodings: {e}")
+            return False
     
     def load_face_encodings(self):
-        """Load face encodings from file."""
+        """Load every stored encoding into the gallery with one query."""
         try:
-            with open(Config.FACE_ENCODINGS_PATH, 'rb') as f:
-                data = pickle.load(f)
-                self.known_face_encodings = data['encodings']
-                self.known_face_names = data['names']
+            _, names, encodings = self.store.load()
+            self.gallery.replace(encodings, names)
+            self.tracker.reset()
+            if not names:
+                print("No face encodings found. Please register faces first.")
+        except Exception as e:
+            print(f"Error loading face encodings: {e}")
+    
+    def _import_legacy_encodings(self):
+        """Move encodings from the old array directory or pickle into the database, once.
+        
+        The legacy file is renamed afterwards, so deleting every face later
+        cannot bring the imported ones back on the next start.
+        """
+        legacy_pickle = Config.FACE_ENCODINGS_PATH.with_suffix(".pkl")
+        legacy_path = next((path for path in (Config.FACE_ENCODINGS_PATH, legacy_pickle)
+                            if os.path.exists(path)), None)
+        if legacy_path is None:
+            return
+        
+        try:
+            # A populated table means an earlier start already imported these
+            if self.store.count() == 0:
+                if legacy_path == legacy_pickle:
+                    with open(legacy_pickle, 'rb') as f:
+                        data = pickle.load(f)
+                    encodings, names = data['encodings'], data['names']
+                else:
+                    arrays, _ = load_arrays(legacy_path)
+                    encodings, names = arrays['encodings'], arrays['names']
                 
-        except FileNotFoundError:
-            print("No face encodings found. Please register faces first.")
+                encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+                imported = self.store.import_encodings(encodings, [str(name) for name in names])
+                print(f"Imported {imported} face encodings into the database.")
+            
+            os.replace(legacy_path, legacy_path.with_name(f"{legacy_path.name}.imported"))
         except Exception as e:
-            print(f"Error loading face encodings: {e}")
\ No newline at end of file
+            print(f"Error importing legacy face encodings: {e}")
@@ -0,0 +1,171 @@
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional
+import cv2
+import numpy as np
+from config import Config
+
+class TrackedFace(NamedTuple):
+    location: tuple  # (top, right, bottom, left) in frame pixels
+    name: Optional[str]  # None when no enrolled face is within tolerance
+    distance: float
+    verified: bool  # Whether the face was encoded and matched on this frame
+
+class _Track:
+    """A face followed across frames, as a box in the downscaled frame."""
+
+    __slots__ = ('box', 'template', 'name', 'distance', 'verified_at')
+
+    def __init__(self, box: tuple, template: np.ndarray, name: Optional[str],
+                 distance: float, verified_at: int):
+        self.box = box  # (x, y, width, height)
+        self.template = template
+        self.name = name
+        self.distance = distance
+        self.verified_at = verified_at  # Frame number of the last encoding
+
+def _overlap(a: tuple, b: tuple) -> float:
+    """Intersection over union of two (x, y, width, height) boxes."""
+    width = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    height = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    return intersection / (a[2] * a[3] + b[2] * b[3] - intersection)
+
+class FaceTracker:
+    """Follows faces between frames so detection and encoding run only when needed.
+
+    Every frame is downscaled by Config.FACE_DETECTION_SCALE and each known
+    face is found again by normalized template matching near its last box,
+    which costs far less than detection. Detection runs on the downscaled
+    frame every FACE_TRACKING_DETECT_EVERY frames, when a track is lost, and
+    while nothing is tracked. A detected face that overlaps a track keeps the
+    track's identity. The encoder and the gallery run only for new faces and
+    for tracks that have gone FACE_TRACKING_VERIFY_EVERY frames unverified.
+    """
+
+    def __init__(self, detect: Callable, encode: Callable, match: Callable):
+        self.detect = detect  # RGB frame -> [(top, right, bottom, left)]
+        self.encode = encode  # (RGB frame, locations) -> encodings
+        self.match = match  # Encodings -> [(name or None, distance)]
+        self._lock = threading.Lock()
+        self._counters = {'frames': 0, 'detections': 0, 'encodings': 0, 'lost': 0}
+        self.reset()
+
+    def reset(self):
+        """Forget every track, e.g. after the enrolled faces change."""
+        # Waits out an update in flight, whose tracks were matched against
+        # the old gallery and would otherwise be published after the reset
+        with self._lock:
+            self._tracks = []
+            self._frame = 0
+            self._last_frame_at = 0.0
+
+    def stats(self) -> dict:
+        """Frames seen and how many of them paid for detection and encoding."""
+        with self._lock:
+            return dict(self._counters)
+
+    def update(self, frame: np.ndarray, rgb: bool = False) -> List[TrackedFace]:
+        """Faces in a BGR (or, with `rgb`, RGB) frame with their identities."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_frame_at > Config.FACE_TRACKING_MAX_GAP:
+                # Too long since the last frame for the boxes to mean anything
+                self._tracks = []
+            self._last_frame_at = now
+            self._frame += 1
+            self._counters['frames'] += 1
+
+            scale = Config.FACE_DETECTION_SCALE
+            small = frame if scale == 1 else cv2.resize(
+                frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+            gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+
+            lost = self._follow(gray)
+            if lost or not self._tracks or self._frame % Config.FACE_TRACKING_DETECT_EVERY == 0:
+                self._redetect(frame, small, gray, rgb)
+
+            return [TrackedFace(self._location(track.box), track.name, track.distance,
+                                track.verified_at == self._frame)
+                    for track in self._tracks]
+
+    def _follow(self, gray: np.ndarray) -> bool:
+        """Move every track to its best template match; returns whether any was lost."""
+        kept = []
+        for track in self._tracks:
+            x, y, width, height = track.box
+            margin = int(Config.FACE_TRACKING_SEARCH_MARGIN * max(width, height))
+            left, top = max(x - margin, 0), max(y - margin, 0)
+            right = min(x + width + margin, gray.shape[1])
+            bottom = min(y + height + margin, gray.shape[0])
+            if right - left < width or bottom - top < height:
+                continue
+
+            scores = cv2.matchTemplate(gray[top:bottom, left:right], track.template,
+                                       cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < Config.FACE_TRACKING_MIN_SCORE:
+                continue
+
+            track.box = (left + dx, top + dy, width, height)
+            track.template = self._patch(gray, track.box)
+            kept.append(track)
+
+        lost = len(kept) < len(self._tracks)
+        self._counters['lost'] += len(self._tracks) - len(kept)
+        self._tracks = kept
+        return lost
+
+    def _redetect(self, frame: np.ndarray, small: np.ndarray, gray: np.ndarray, rgb: bool):
+        """Detect on the downscaled frame; encode only new or due-for-verification faces."""
+        self._counters['detections'] += 1
+        rows, columns = gray.shape
+        boxes = []
+        detected = self.detect(small if rgb else cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        for top, right, bottom, left in detected:
+            top, left = max(int(top), 0), max(int(left), 0)
+            bottom, right = min(int(bottom), rows), min(int(right), columns)
+            if bottom > top and right > left:
+                boxes.append((left, top, right - left, bottom - top))
+
+        tracks, pending = [], []
+        unclaimed = list(self._tracks)
+        for box in boxes:
+            track = max(unclaimed, key=lambda candidate: _overlap(box, candidate.box), default=None)
+            if track is None or _overlap(box, track.box) < 0.5:
+                pending.append(box)
+                continue
+            unclaimed.remove(track)
+            if self._frame - track.verified_at >= Config.FACE_TRACKING_VERIFY_EVERY:
+                pending.append(box)
+                continue
+            # Same face: re-anchor the box on the detection and keep the identity
+            track.box, track.template = box, self._patch(gray, box)
+            tracks.append(track)
+
+        if pending:
+            self._counters['encodings'] += len(pending)
+            if not rgb:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            encodings = self.encode(frame, [self._location(box) for box in pending])
+            matches = self.match(np.asarray(encodings)) if len(encodings) else []
+            for box, (name, distance) in zip(pending, matches):
+                tracks.append(_Track(box, self._patch(gray, box), name, distance, self._frame))
+        self._tracks = tracks
+
+    @staticmethod
+    def _patch(gray: np.ndarray, box: tuple) -> np.ndarray:
+        """Copy of a box's pixels, so the template outlives the frame."""
+        x, y, width, height = box
+        return gray[y:y + height, x:x + width].copy()
+
+    @staticmethod
+    def _location(box: tuple) -> tuple:
+        """(top, right, bottom, left) in full-frame pixels for a downscaled box."""
+        scale = Config.FACE_DETECTION_SCALE
+        x, y, width, height = box
+        return (int(round(y / scale)), int(round((x + width) / scale)),
+                int(round((y + height) / scale)), int(round(x / scale)))
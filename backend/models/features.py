@@ -0,0 +1,107 @@
+import threading
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from config import Config
+from models.compact import CompactTfidfVectorizer, export_vectorizer, load_arrays, save_arrays
+from models.registry import compute_fingerprint
+from utils import text_processing
+from utils.text_processing import normalize, tokenize
+
+class SharedFeatures(NamedTuple):
+    vectorizer: object  # The vectorizer that produced the matrix
+    matrix: sparse.csr_matrix  # One tf-idf row per text
+
+def analyze(text: str, ngram_range: Tuple[int, int] = (1, 2), lemmatize: bool = True) -> List[str]:
+    """Word n-grams of a raw text, lemmatized unless `lemmatize` is off.
+
+    Stop words are kept: they carry little for intents but a lot for
+    emotions ("not happy"), and the classifiers weigh them per label.
+    """
+    tokens = tokenize(normalize(text))
+    if lemmatize:
+        lemmas = text_processing.get_lemma_table()
+        tokens = [lemmas.get(token, token) for token in tokens]
+    low, high = ngram_range
+    return [' '.join(tokens[start:start + n])
+            for n in range(low, high + 1)
+            for start in range(len(tokens) - n + 1)]
+
+class SharedFeaturizer:
+    """One vocabulary and one tokenize/vectorize pass for every text classifier.
+
+    The vocabulary is fitted on the union of the intent and emotion
+    corpora, and each classifier is trained on top of it. A command is then
+    vectorized once and the same sparse row goes to every head. Fitting
+    publishes a new vectorizer object; heads keep the one they were trained
+    against, and SharedFeatures carries its producer so a head can tell
+    whether a precomputed matrix fits it.
+    """
+
+    HYPERPARAMETERS = {'max_features': 5000, 'ngram_range': (1, 2), 'sublinear_tf': True}
+
+    def __init__(self):
+        self.vectorizer = None
+        self.trained_on = None  # Fingerprint the current vocabulary was fitted from
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def training_texts(*datasets: Dict[str, Dict[str, List[str]]]) -> List[str]:
+        """Every example of every label of each {'intents'|'emotions': {...}} dataset."""
+        return [example
+                for dataset in datasets
+                for examples_by_label in dataset.values()
+                for examples in examples_by_label.values()
+                for example in examples]
+
+    def fingerprint(self, texts: List[str]) -> str:
+        """Registry fingerprint of the vocabulary fit would build from these texts."""
+        hyperparameters = dict(self.HYPERPARAMETERS, lemmas=len(text_processing.get_lemma_table()))
+        return compute_fingerprint({'texts': texts}, hyperparameters,
+                                   [__file__, text_processing.__file__])
+
+    def fit(self, texts: List[str]):
+        """Fit the shared vocabulary, save it and serve it the way a load would."""
+        params = self.HYPERPARAMETERS
+        fitted = TfidfVectorizer(
+            analyzer=partial(analyze, ngram_range=params['ngram_range']),
+            max_features=params['max_features'], sublinear_tf=params['sublinear_tf']
+        )
+        fitted.fit(texts)
+        arrays = export_vectorizer(fitted)
+        meta = {
+            'format': 1,
+            'trained_on': self.fingerprint(texts),
+            'ngram_range': list(params['ngram_range']),
+            'vectorizer': {'norm': 'l2', 'use_idf': True, 'sublinear_tf': params['sublinear_tf']}
+        }
+        save_arrays(Config.SHARED_FEATURES_PATH, arrays, meta)
+        self._publish(arrays, meta)
+
+    def _publish(self, arrays: Dict[str, np.ndarray], meta: dict):
+        """Serve a saved vocabulary through the batched compact transform."""
+        analyzer = partial(analyze, ngram_range=tuple(meta['ngram_range']))
+        vectorizer = CompactTfidfVectorizer(
+            arrays['terms'], arrays['idf'], meta['vectorizer'], analyzer=analyzer
+        )
+        with self._lock:
+            self.vectorizer = vectorizer
+            self.trained_on = meta['trained_on']
+
+    def transform(self, texts: List[str]) -> Optional[SharedFeatures]:
+        """Features for raw texts, or None before a vocabulary exists."""
+        vectorizer = self.vectorizer
+        if vectorizer is None:
+            return None
+        return SharedFeatures(vectorizer, sparse.csr_matrix(vectorizer.transform(texts)))
+
+    def load(self):
+        """Map the saved vocabulary."""
+        try:
+            arrays, meta = load_arrays(Config.SHARED_FEATURES_PATH)
+            self._publish(arrays, meta)
+        except FileNotFoundError:
+            print("No shared feature vocabulary found.")
@@ -1,53 +1,46 @@
-
-import pickle
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import re
+from typing import List
 from Config import Config as Config
-
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
+from models import online_intent
+from models.entity_extractor import EntityExtractor, build_default_extractor
+from models.compact import (FeaturePipeline, export_classifier, export_pipeline, load_arrays,
+                            load_classifier, load_pipeline, save_arrays)
+from models.features import SharedFeaturizer, SharedFeatures
+from models.online_intent import OnlineIntentModel
+from models.registry import compute_fingerprint
+from utils.cache import LRUCache, MISSING
+from utils import text_processing
+from utils.text_processing import STOP_WORDS, cache_key, preprocess
 
 class NLPModel:
-    def __init__(self):
+    HYPERPARAMETERS = {
+        'tfidf': {'max_features': 1000, 'ngram_range': (1, 2)},
+        'classifier': {'alpha': 0.1},
+        'split': {'test_size': 0.2, 'random_state': 42}
+    }
+    
+    def __init__(self, featurizer: SharedFeaturizer = None):
         self.pipeline = None
+        self.featurizer = featurizer
         self.intent_labels = []
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
+        self.stop_words = STOP_WORDS
+        self.online_model = None
+        self.entity_extractor = build_default_extractor()
+        
+        # Features and probabilities per normalized utterance; cleared
+        # whenever a new model is trained or loaded
+        self.prediction_cache = LRUCache(Config.PREDICTION_CACHE_SIZE)
         
         # Load trained model if exists
         self.load_model()
     
     def preprocess_text(self, text: str) -> str:
         """Preprocess text for NLP processing."""
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove special characters and digits
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
-        
-        # Tokenize
-        tokens = word_tokenize(text)
-        
-        # Remove stopwords and lemmatize
-        tokens = [self.lemmatizer.lemmatize(token) 
-                 for token in tokens if token not in self.stop_words]
-        
-        return ' '.join(tokens)
+        return preprocess(text)
     
     def train_model(self, training_data: dict):
         """Train the NLP model with intent classification."""
@@ -56,104 +49,234 @@ class NLPModel:
         
         for intent, examples in training_data['intents'].items():
             for example in examples:
-                texts.append(self.preprocess_text(example))
+                texts.append(example)
                 labels.append(intent)
+        texts = self._model_inputs(texts)
         
-        # Create pipeline
-        self.pipeline = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=1000, ngram_range=(1, 2))),
-            ('classifier', MultinomialNB(alpha=0.1))
-        ])
-        
-        # Train model
+        # Build and fit a new model; the current one keeps serving until the swap
+        params = self.HYPERPARAMETERS
         X_train, X_test, y_train, y_test = train_test_split(
-            texts, labels, test_size=0.2, random_state=42
+            texts, labels, **params['split']
         )
         
-        self.pipeline.fit(X_train, y_train)
-        self.intent_labels = list(set(labels))
+        if Config.ONLINE_INTENT_LEARNING:
+            pipeline = self._train_online_model(X_train, y_train)
+        elif self.uses_shared_features:
+            # Only the classifier is fitted; the vocabulary belongs to the featurizer
+            vectorizer = self.featurizer.vectorizer
+            classifier = MultinomialNB(**params['classifier'])
+            classifier.fit(vectorizer.transform(X_train), y_train)
+            # Served from the same float32 arrays a later load maps
+            pipeline = FeaturePipeline(vectorizer, load_classifier(export_classifier(classifier)))
+        else:
+            pipeline = Pipeline([
+                ('tfidf', TfidfVectorizer(**params['tfidf'])),
+                ('classifier', MultinomialNB(**params['classifier']))
+            ])
+            pipeline.fit(X_train, y_train)
+        
+        self.pipeline = pipeline
+        self.intent_labels = list(set(labels) | {str(label) for label in pipeline.classes_})
+        self._clear_prediction_cache()
         
         # Evaluate
-        accuracy = self.pipeline.score(X_test, y_test)
+        accuracy = pipeline.score(X_test, y_test)
         print(f"Model trained with accuracy: {accuracy:.4f}")
         
         # Save model
         self.save_model()
     
-    def predict_intent(self, text: str) -> tuple:
+    def _train_online_model(self, texts: List[str], labels: List[str]):
+        """Fresh online model from the base examples plus every taught example."""
+        online_model = OnlineIntentModel()
+        online_model.partial_fit(texts, labels)
+        online_model.replay_journal(self.preprocess_text)
+        self.online_model = online_model
+        return online_model.pipeline()
+    
+    def learn_examples(self, texts: List[str], intents: List[str]) -> bool:
+        """Fold taught or corrected utterances into the online model, no refit."""
+        if not self.online_model:
+            print("Online intent learning is disabled or no model is loaded.")
+            return False
+        
+        # The new snapshot is swapped in whole; predictions in flight keep the old one
+        self.pipeline = self.online_model.learn(texts, intents, self.preprocess_text)
+        self.intent_labels = list(set(self.intent_labels) | set(intents))
+        self._clear_prediction_cache()
+        return True
+    
+    def taught_examples(self) -> List[tuple]:
+        """(text, intent) pairs taught through learn_examples, oldest first."""
+        if not self.online_model:
+            return []
+        texts, intents = self.online_model.read_journal()
+        return list(zip(texts, intents))
+    
+    @property
+    def uses_shared_features(self) -> bool:
+        """Whether the classifier sits on the shared featurizer (online learning keeps its own)."""
+        return self.featurizer is not None and not Config.ONLINE_INTENT_LEARNING
+    
+    def _model_inputs(self, texts: List[str]) -> List[str]:
+        """Texts as the active vectorizer expects them."""
+        # The shared analyzer normalizes and lemmatizes raw text itself
+        if self.uses_shared_features:
+            return list(texts)
+        return [self.preprocess_text(text) for text in texts]
+    
+    @property
+    def model_path(self):
+        """Artifact the active training mode saves to."""
+        return Config.ONLINE_INTENT_MODEL_PATH if Config.ONLINE_INTENT_LEARNING else Config.NLP_MODEL_PATH
+    
+    def fingerprint(self, training_data: dict) -> str:
+        """Registry fingerprint of the model train_model would build from this data."""
+        # Preprocessing depends on whether the lemma table could be built
+        hyperparameters = dict(self.HYPERPARAMETERS, lemmas=len(text_processing.get_lemma_table()))
+        sources = [__file__, text_processing.__file__]
+        if Config.ONLINE_INTENT_LEARNING:
+            hyperparameters['online'] = {
+                'features': Config.ONLINE_INTENT_FEATURES, 'alpha': Config.ONLINE_INTENT_ALPHA
+            }
+            sources.append(online_intent.__file__)
+        elif self.uses_shared_features:
+            hyperparameters['shared_features'] = self.featurizer.trained_on
+        return compute_fingerprint(training_data, hyperparameters, sources)
+    
+    def predict_intent(self, text: str, features: SharedFeatures = None) -> tuple:
         """Predict intent from text."""
-        if not self.pipeline:
-            return "unknown", 0.0
+        intent, confidence, _ = self.predict_intents([text], features=features)[0]
+        return intent, confidence
+    
+    def predict_intents(self, texts: List[str], top_k: int = 1,
+                        features: SharedFeatures = None) -> List[tuple]:
+        """Predict intents for a batch of texts in one vectorize/predict_proba pass.
         
-        processed_text = self.preprocess_text(text)
+        Returns one (intent, confidence, top_intents) tuple per text, where
+        top_intents holds the top_k (intent, probability) pairs, best first.
+        Repeated utterances are answered from the prediction cache. `features`
+        are shared features already computed for `texts`; they are used when
+        they come from the vectorizer this model was trained against.
+        """
+        if not self.pipeline:
+            return [("unknown", 0.0, []) for _ in texts]
         
-        # Predict intent
-        intent = self.pipeline.predict([processed_text])[0]
+        # Version before pipeline: a retrain swaps the pipeline, then clears
+        version = self.prediction_cache.version
+        pipeline = self.pipeline
+        keys = [cache_key(text) for text in texts]
+        entries = [self.prediction_cache.get(key) for key in keys]
         
-        # Get confidence scores
-        probabilities = self.pipeline.predict_proba([processed_text])[0]
-        confidence = max(probabilities)
+        misses = sorted({key for key, entry in zip(keys, entries) if entry is MISSING})
+        if misses:
+            if features is not None and features.vectorizer is pipeline[0]:
+                rows = {key: row for row, key in enumerate(keys)}
+                features = features.matrix[[rows[key] for key in misses]]
+            else:
+                features = pipeline[:-1].transform(self._model_inputs(misses))
+            probabilities = pipeline[-1].predict_proba(features)
+            computed = {}
+            for row, key in enumerate(misses):
+                computed[key] = (features[row], probabilities[row])
+                self.prediction_cache.put(key, computed[key], version)
+            entries = [computed[key] if entry is MISSING else entry
+                       for key, entry in zip(keys, entries)]
         
-        return intent, confidence
+        # Label and confidence both come from the same probability row
+        classes = pipeline.classes_
+        results = []
+        for _, row in entries:
+            top_indices = np.argsort(-row)[:top_k]
+            top_intents = [(str(classes[i]), float(row[i])) for i in top_indices]
+            best_index = int(row.argmax())
+            results.append((str(classes[best_index]), float(row[best_index]), top_intents))
+        return results
+    
+    def cache_stats(self) -> dict:
+        """Hit/miss/eviction counters for the prediction cache."""
+        return self.prediction_cache.stats()
+    
+    def _clear_prediction_cache(self):
+        """Drop predictions made by the pipeline that was just replaced."""
+        self.prediction_cache.clear()
     
     def extract_entities(self, text: str, intent: str) -> dict:
         """Extract entities based on intent."""
         entities = {}
         text_lower = text.lower()
+        spans = self.entity_extractor.extract(text, intent)
+        best = EntityExtractor.best
         
         if intent == "remember_event":
-            # Extract date patterns
-            date_patterns = [
-                r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
-                r'(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{1,2})',
-                r'(\d{1,2})\s+(january|february|march|april|may|june|july|august|september|october|november|december)',
-                r'(today|tomorrow|next week|next month)'
-            ]
+            date = best(spans, 'date')
+            if date:
+                entities['date'] = date.text
             
-            for pattern in date_patterns:
-                match = re.search(pattern, text_lower)
-                if match:
-                    entities['date'] = match.group()
-                    break
-            
-            # Extract event description
-            remember_keywords = ['remember', 'remind', 'event', 'appointment']
-            for keyword in remember_keywords:
-                if keyword in text_lower:
-                    # Extract text after the keyword
-                    parts = text_lower.split(keyword, 1)
-                    if len(parts) > 1:
-                        entities['description'] = parts[1].strip()
-                        break
+            # Event description is the text after the marker
+            marker = best(spans, 'event_marker')
+            if marker:
+                entities['description'] = text_lower[marker.end:].strip()
+        
+        elif intent == "remember_fact":
+            marker = best(spans, 'fact_marker')
+            if marker:
+                entities['fact'] = text_lower[marker.end:].strip()
         
         elif intent == "play_music":
             # Extract song/artist names
-            music_keywords = ['play', 'song', 'music', 'artist']
-            for keyword in music_keywords:
-                if keyword in text_lower:
-                    parts = text_lower.split(keyword, 1)
-                    if len(parts) > 1:
-                        entities['query'] = parts[1].strip()
-                        break
+            marker = best(spans, 'music_marker')
+            if marker:
+                entities['query'] = text_lower[marker.end:].strip()
+            action = best(spans, 'music_action')
+            if action:
+                entities['action'] = action.value
         
         return entities
     
     def save_model(self):
-        """Save the trained model."""
-        if self.pipeline:
-            model_data = {
-                'pipeline': self.pipeline,
-                'intent_labels': self.intent_labels
-            }
-            with open(Config.NLP_MODEL_PATH, 'wb') as f:
-                pickle.dump(model_data, f)
+        """Save the trained model as flat float32 arrays that load memory-mapped."""
+        if Config.ONLINE_INTENT_LEARNING:
+            if self.online_model:
+                self.online_model.save()
+        elif self.uses_shared_features:
+            if self.pipeline:
+                arrays = export_classifier(self.pipeline[-1])
+                meta = {'format': 1, 'shared_features': self.featurizer.trained_on,
+                        'intent_labels': self.intent_labels}
+                save_arrays(Config.NLP_MODEL_PATH, arrays, meta)
+        elif self.pipeline:
+            arrays, meta = export_pipeline(self.pipeline)
+            meta = dict(meta, intent_labels=self.intent_labels)
+            save_arrays(Config.NLP_MODEL_PATH, arrays, meta)
     
     def load_model(self):
         """Load the trained model."""
         try:
-            with open(Config.NLP_MODEL_PATH, 'rb') as f:
-                model_data = pickle.load(f)
-                self.pipeline = model_data['pipeline']
-                self.intent_labels = model_data['intent_labels']
+            if Config.ONLINE_INTENT_LEARNING:
+                # Snapshot plus whatever was taught after it was saved
+                online_model = OnlineIntentModel()
+                online_model.load()
+                online_model.replay_journal(self.preprocess_text)
+                self.online_model = online_model
+                self.pipeline = online_model.pipeline()
+                self.intent_labels = [str(label) for label in self.pipeline.classes_]
+            else:
+                # Pages are shared between processes and loading cost is independent of size
+                arrays, meta = load_arrays(Config.NLP_MODEL_PATH)
+                if self.uses_shared_features:
+                    # The classifier's columns only mean something under the vocabulary it saw
+                    if (self.featurizer.vectorizer is None
+                            or meta.get('shared_features') != self.featurizer.trained_on):
+                        raise ValueError("Saved model was trained on a different feature vocabulary")
+                    self.pipeline = FeaturePipeline(self.featurizer.vectorizer, load_classifier(arrays))
+                elif 'shared_features' in meta:
+                    raise ValueError("Saved model needs the shared featurizer")
+                else:
+                    self.pipeline = load_pipeline(arrays, meta)
+                self.intent_labels = meta['intent_labels']
+            self._clear_prediction_cache()
         except FileNotFoundError:
-            print("No trained model found. Please train the model first.")
\ No newline at end of file
+            print("No trained model found. Please train the model first.")
+        except ValueError as e:
+            print(f"Error loading NLP model: {e}")
\ No newline at end of file
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from config import Config
+from models.compact import FeaturePipeline, dot_gathered, load_arrays, save_arrays
+
+class OnlineNaiveBayesSnapshot:
+    """Immutable multinomial naive Bayes state; predictions never see a partial update."""
+
+    def __init__(self, classes: List[str], rows: List[np.ndarray], totals: np.ndarray,
+                 doc_counts: np.ndarray, alpha: float):
+        self.classes_ = np.array(classes, dtype=str)
+        self.rows = rows
+        self.totals = totals
+        self.doc_counts = doc_counts
+        self.alpha = alpha
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, identical to MultinomialNB on the same counts."""
+        X = sparse.csr_matrix(X)
+        n_features = X.shape[1]
+        # log(count + alpha) only for the columns present; the normalizer
+        # log(total + alpha * n_features) is per class and factors out
+        gathered = np.log(np.array([row[X.indices] for row in self.rows]) + self.alpha)
+        normalizers = np.log(self.totals + self.alpha * n_features)
+        class_log_prior = np.log(self.doc_counts / self.doc_counts.sum())
+
+        joint = (dot_gathered(X, gathered)
+                 - np.asarray(X.sum(axis=1)) * normalizers + class_log_prior)
+        joint -= joint.max(axis=1, keepdims=True)
+        probabilities = np.exp(joint)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        """Most probable class per row."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+class OnlineIntentModel:
+    """Intent classifier that folds in new examples without refitting.
+
+    Features come from a stateless hashing vectorizer, so there is no
+    vocabulary to rebuild, and the classifier keeps per-class count rows.
+    An update copies only the rows of the classes it touches and publishes
+    a new snapshot with one reference swap; unseen labels simply add a row.
+    Every taught example is also appended to a journal, so it survives
+    restarts and full retrains.
+    """
+
+    def __init__(self, directory: Path = None, journal_path: Path = None):
+        self.directory = Path(directory or Config.ONLINE_INTENT_MODEL_PATH)
+        self.journal_path = Path(journal_path or Config.INTENT_JOURNAL_PATH)
+        self.alpha = Config.ONLINE_INTENT_ALPHA
+        self.vectorizer = HashingVectorizer(
+            n_features=Config.ONLINE_INTENT_FEATURES, ngram_range=(1, 2),
+            alternate_sign=False, norm='l2'
+        )
+        self._lock = threading.Lock()
+        self._learn_lock = threading.Lock()
+        # Journal lines already folded into the snapshot
+        self.journal_lines = 0
+        self.snapshot = None
+
+    def partial_fit(self, texts: List[str], labels: List[str]) -> FeaturePipeline:
+        """Fold preprocessed examples in; cost is proportional to the examples."""
+        X = sparse.csr_matrix(self.vectorizer.transform(texts))
+        labels = np.asarray(labels, dtype=str)
+
+        with self._lock:
+            current = self.snapshot
+            if current is None:
+                classes, rows = [], []
+                totals, doc_counts = np.empty(0), np.empty(0)
+            else:
+                classes, rows = list(current.classes_), list(current.rows)
+                totals, doc_counts = current.totals.copy(), current.doc_counts.copy()
+
+            for label in np.unique(labels):
+                members = X[labels == label]
+                if label not in classes:
+                    classes.append(str(label))
+                    rows.append(np.zeros(X.shape[1]))
+                    totals = np.append(totals, 0.0)
+                    doc_counts = np.append(doc_counts, 0.0)
+                index = classes.index(label)
+
+                # Copy-on-write: readers of the old snapshot keep the old row
+                summed = members.sum(axis=0).A1
+                columns = np.flatnonzero(summed)
+                row = np.array(rows[index])
+                row[columns] += summed[columns]
+                rows[index] = row
+                totals[index] += summed[columns].sum()
+                doc_counts[index] += members.shape[0]
+
+            self.snapshot = OnlineNaiveBayesSnapshot(classes, rows, totals, doc_counts, self.alpha)
+            return self.pipeline()
+
+    def pipeline(self) -> FeaturePipeline:
+        """Pipeline view over the current snapshot."""
+        snapshot = self.snapshot
+        return FeaturePipeline(self.vectorizer, snapshot) if snapshot else None
+
+    def learn(self, texts: List[str], labels: List[str],
+              preprocess: Callable[[str], str]) -> FeaturePipeline:
+        """Journal taught examples, then fold them in."""
+        with self._learn_lock:
+            os.makedirs(self.journal_path.parent, exist_ok=True)
+            with open(self.journal_path, 'a') as f:
+                for text, label in zip(texts, labels):
+                    f.write(json.dumps({'text': text, 'intent': label}) + "\n")
+            self.journal_lines += len(texts)
+            return self.partial_fit([preprocess(text) for text in texts], labels)
+
+    def read_journal(self, start: int = 0) -> tuple:
+        """Taught (texts, intents) from journal line `start` on."""
+        texts, labels = [], []
+        try:
+            with open(self.journal_path, 'r') as f:
+                for line_number, line in enumerate(f, 1):
+                    if line_number > start:
+                        example = json.loads(line)
+                        texts.append(example['text'])
+                        labels.append(example['intent'])
+        except FileNotFoundError:
+            pass
+        return texts, labels
+
+    def replay_journal(self, preprocess: Callable[[str], str]) -> int:
+        """Fold in journal entries the snapshot does not include yet."""
+        with self._learn_lock:
+            texts, labels = self.read_journal(self.journal_lines)
+            if texts:
+                self.partial_fit([preprocess(text) for text in texts], labels)
+                self.journal_lines += len(texts)
+            return len(texts)
+
+    def save(self):
+        """Write the snapshot as arrays, noting how much of the journal it includes."""
+        with self._learn_lock:
+            snapshot, journal_lines = self.snapshot, self.journal_lines
+        if snapshot is None:
+            return
+        arrays = {
+            'counts': np.array(snapshot.rows),
+            'classes': snapshot.classes_,
+            'totals': snapshot.totals,
+            'doc_counts': snapshot.doc_counts
+        }
+        meta = {
+            'format': 1,
+            'alpha': self.alpha,
+            'n_features': self.vectorizer.n_features,
+            'journal_lines': journal_lines
+        }
+        save_arrays(self.directory, arrays, meta)
+
+    def load(self):
+        """Map the saved snapshot and the journal lines it already covers."""
+        arrays, meta = load_arrays(self.directory)
+        if meta['n_features'] != self.vectorizer.n_features:
+            raise ValueError("Saved online intent model uses a different feature size")
+
+        with self._lock:
+            self.snapshot = OnlineNaiveBayesSnapshot(
+                list(arrays['classes']), list(arrays['counts']),
+                np.array(arrays['totals']), np.array(arrays['doc_counts']), meta['alpha']
+            )
+            self.journal_lines = meta['journal_lines']
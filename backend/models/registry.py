@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import pickle
+import platform
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+import numpy as np
+import sklearn
+
+def library_versions() -> dict:
+    """Versions whose changes can alter a trained artifact."""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__
+    }
+
+def compute_fingerprint(training_data: dict, hyperparameters: dict,
+                        sources: Iterable[str] = ()) -> str:
+    """Content hash of everything that determines a trained model.
+
+    `sources` are the files holding the featurization and training code, so
+    editing them retrains just like editing the data would.
+    """
+    digest = hashlib.sha256()
+    payload = {
+        'data': training_data,
+        'hyperparameters': hyperparameters,
+        'libraries': library_versions()
+    }
+    digest.update(json.dumps(payload, sort_keys=True, default=str).encode('utf-8'))
+    for source in sources:
+        with open(source, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def manifest_path(artifact_path) -> Path:
+    """Manifest file stored next to an artifact."""
+    artifact_path = Path(artifact_path)
+    return artifact_path.with_name(artifact_path.name + ".manifest.json")
+
+def _file_digest(path) -> str:
+    """sha256 of a file's bytes, or of the file listing of an array directory.
+
+    Array directories are identified by name, size and mtime of each file so
+    checking them never reads (or faults in) the mapped arrays.
+    """
+    path = Path(path)
+    digest = hashlib.sha256()
+    if path.is_dir():
+        for file_path in sorted(path.iterdir()):
+            stat = file_path.stat()
+            digest.update(f"{file_path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    else:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def save_artifact(path, obj):
+    """Pickle an artifact atomically so readers never see a partial file."""
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(temp_path, path)
+
+def write_manifest(artifact_path, fingerprint: str):
+    """Record which fingerprint produced the artifact currently on disk."""
+    manifest = {
+        'fingerprint': fingerprint,
+        'artifact_sha256': _file_digest(artifact_path),
+        'libraries': library_versions(),
+        'created_at': time.time()
+    }
+    path = manifest_path(artifact_path)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+def is_current(artifact_path, fingerprint: str) -> bool:
+    """True if the artifact on disk was built from this exact fingerprint."""
+    try:
+        with open(manifest_path(artifact_path), 'r') as f:
+            manifest = json.load(f)
+        return (manifest.get('fingerprint') == fingerprint
+                and manifest.get('artifact_sha256') == _file_digest(artifact_path))
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return False
+
+def ensure_trained(name: str, artifact_path, fingerprint: str, loaded: bool,
+                   train: Callable[[], None], background: bool = False):
+    """Retrain a model only if its artifact is missing or out of date.
+
+    `loaded` says whether the model already holds the artifact on disk. With
+    `background` set, a stale but loaded model keeps serving while the new
+    one trains on a daemon thread. Returns that thread, or None.
+    """
+    if loaded and is_current(artifact_path, fingerprint):
+        return None
+
+    def retrain():
+        started = time.perf_counter()
+        try:
+            train()
+            write_manifest(artifact_path, fingerprint)
+            print(f"Trained {name} model in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"Error training {name} model: {e}")
+
+    if background and loaded:
+        thread = threading.Thread(target=retrain, name=f"retrain-{name}")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    retrain()
+    return None
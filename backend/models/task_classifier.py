@@ -0,0 +1,138 @@
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from config import Config
+from utils.text_processing import cache_key
+
+class IntentRouter:
+    """Routes utterances to intents through cheap stages before the NLP model.
+
+    1. exact: O(1) lookup of the normalized utterance among known phrases,
+       also with filler words like "please" trimmed from either end.
+    2. prefix: longest known phrase that starts the utterance, found by
+       walking a word trie, accepted if it covers enough of the utterance.
+    3. model: NLPModel.predict_intent for everything else.
+
+    Phrases that map to more than one intent never answer from the fast
+    stages, and neither do utterances whose match is ambiguous.
+    """
+
+    STAGES = ('exact', 'prefix', 'model')
+
+    def __init__(self, nlp_model, training_data: dict = None):
+        self.nlp_model = nlp_model
+        # (normalized phrase -> intents, word trie), replaced as one reference
+        self._index = ({}, {})
+        self._lock = threading.Lock()
+        self.hits = dict.fromkeys(self.STAGES, 0)
+        if training_data:
+            self.build(training_data)
+
+    def build(self, training_data: dict, taught: List[Tuple[str, str]] = ()):
+        """Index training phrases, then taught examples (which override them)."""
+        phrases = {}
+        for intent, examples in training_data['intents'].items():
+            for example in examples:
+                key = cache_key(example)
+                if key:
+                    phrases.setdefault(key, set()).add(intent)
+        for text, intent in taught:
+            key = cache_key(text)
+            if key:
+                phrases[key] = {intent}
+
+        trie = {}
+        for key, intents in phrases.items():
+            self._insert(trie, key, intents)
+
+        # Swap both indexes at once so lookups never mix old and new
+        with self._lock:
+            self._index = (phrases, trie)
+
+    @staticmethod
+    def _insert(trie: dict, key: str, intents: Set[str]):
+        """Store a phrase's intents at the node reached by its words."""
+        node = trie
+        for word in key.split():
+            node = node.setdefault(word, {})
+        node[None] = intents
+
+    def _lookup(self, key: str) -> Tuple[Optional[str], float, str]:
+        """(intent, confidence, stage) from the fast stages, or (None, 0.0, '')."""
+        phrases, trie = self._index
+
+        # Politeness and wake words around a known phrase do not change it
+        words = key.split()
+        while words and words[0] in Config.ROUTER_FILLER_WORDS:
+            words.pop(0)
+        while words and words[-1] in Config.ROUTER_FILLER_WORDS:
+            words.pop()
+
+        for candidate in (key, ' '.join(words)):
+            intents = phrases.get(candidate)
+            if intents:
+                return (next(iter(intents)), 1.0, 'exact') if len(intents) == 1 else (None, 0.0, '')
+
+        # Longest known phrase that is a word prefix of the utterance
+        node, matched, matched_words = trie, None, 0
+        for depth, word in enumerate(words, 1):
+            node = node.get(word)
+            if node is None:
+                break
+            if None in node:
+                matched, matched_words = node[None], depth
+
+        coverage = matched_words / len(words) if words else 0.0
+        if matched and len(matched) == 1 and coverage >= Config.ROUTER_MIN_PREFIX_COVERAGE:
+            return next(iter(matched)), coverage, 'prefix'
+        return None, 0.0, ''
+
+    def route(self, text: str, features=None) -> Tuple[str, float, str]:
+        """(intent, confidence, stage) for an utterance; `features` go to the model stage."""
+        intent, confidence, stage = self._lookup(cache_key(text))
+        if intent is None:
+            intent, confidence = self.nlp_model.predict_intent(text, features)
+            stage = 'model'
+
+        with self._lock:
+            self.hits[stage] += 1
+        return intent, confidence, stage
+
+    def predict_intent(self, text: str, features=None) -> tuple:
+        """Drop-in for NLPModel.predict_intent."""
+        intent, confidence, _ = self.route(text, features)
+        return intent, confidence
+
+    def learn_examples(self, texts: List[str], intents: List[str]) -> bool:
+        """Teach the model and make taught phrases answer from the fast path."""
+        if not self.nlp_model.learn_examples(texts, intents):
+            return False
+
+        with self._lock:
+            phrases, trie = self._index
+            phrases = dict(phrases)
+            for text, intent in zip(texts, intents):
+                key = cache_key(text)
+                if key:
+                    phrases[key] = {intent}
+                    trie = self._with_phrase(trie, key.split(), {intent})
+            self._index = (phrases, trie)
+        return True
+
+    @classmethod
+    def _with_phrase(cls, node: dict, words: List[str], intents: Set[str]) -> dict:
+        """Copy of the trie with one phrase set, copying only the nodes on its path."""
+        node = dict(node)
+        if not words:
+            node[None] = intents
+        else:
+            node[words[0]] = cls._with_phrase(node.get(words[0], {}), words[1:], intents)
+        return node
+
+    def stats(self) -> Dict[str, dict]:
+        """Hits and hit ratio per stage."""
+        with self._lock:
+            total = sum(self.hits.values())
+            return {
+                stage: {'hits': hits, 'ratio': hits / total if total else 0.0}
+                for stage, hits in self.hits.items()
+            }
@@ -0,0 +1,31 @@
+import importlib
+import os
+import sys
+import pytest
+
+# Tests import backend modules the way app.py does; models/__init__.py
+# imports its modules by bare name, so the models directory goes on the path too
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [_BACKEND, os.path.join(_BACKEND, 'models')]
+
+try:
+    from config import Config
+except ModuleNotFoundError:
+    # Backend modules import Config.py as `config`, which only resolves on
+    # case-insensitive filesystems
+    sys.modules['config'] = importlib.import_module('Config')
+    from config import Config
+
+@pytest.fixture
+def temp_data(tmp_path, monkeypatch):
+    """Point the database, model and index paths at a per-test directory."""
+    models = tmp_path / "models"
+    models.mkdir()
+    monkeypatch.setattr(Config, 'DATABASE_PATH', tmp_path / "eric_memory.db")
+    monkeypatch.setattr(Config, 'VECTOR_INDEX_DIR', tmp_path / "vector_index")
+    monkeypatch.setattr(Config, 'MODEL_DIR', models)
+    for name in ('NLP_MODEL_PATH', 'EMOTION_MODEL_PATH', 'EMOTION_LINEAR_MODEL_PATH',
+                 'FACE_ENCODINGS_PATH', 'LEMMA_TABLE_PATH', 'SHARED_FEATURES_PATH',
+                 'ONLINE_INTENT_MODEL_PATH', 'INTENT_JOURNAL_PATH'):
+        monkeypatch.setattr(Config, name, models / getattr(Config, name).name)
+    return tmp_path
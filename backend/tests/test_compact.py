@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+import numpy as np
+from models.compact import load_arrays, save_arrays
+
+def test_save_load_round_trip(tmp_path):
+    """Arrays come back mapped and equal, with the metadata as saved."""
+    arrays = {'terms': np.array(['a', 'b'], dtype=str),
+              'weights': np.arange(6, dtype=np.float32).reshape(2, 3)}
+    save_arrays(tmp_path / 'model', arrays, {'format': 1, 'labels': ['x', 'y']})
+
+    loaded, meta = load_arrays(tmp_path / 'model')
+    assert meta == {'format': 1, 'labels': ['x', 'y']}
+    assert sorted(loaded) == ['terms', 'weights']
+    for name, array in arrays.items():
+        assert isinstance(loaded[name], np.memmap)
+        np.testing.assert_array_equal(loaded[name], array)
+    assert os.listdir(tmp_path) == ['model']
+
+def test_load_without_recorded_files(tmp_path):
+    """Directories saved before file names were recorded still load."""
+    os.makedirs(tmp_path / 'model')
+    np.save(tmp_path / 'model' / 'idf.npy', np.ones(3))
+    with open(tmp_path / 'model' / 'meta.json', 'w') as f:
+        json.dump({'format': 1}, f)
+
+    loaded, meta = load_arrays(tmp_path / 'model')
+    assert meta == {'format': 1}
+    np.testing.assert_array_equal(loaded['idf'], np.ones(3))
+
+def test_load_between_renames_reads_previous_version(tmp_path):
+    """While the directory is swapped out, the parked previous version is read."""
+    save_arrays(tmp_path / 'model', {'values': np.zeros(2)}, {'version': 1})
+    os.replace(tmp_path / 'model', tmp_path / 'model.old-123')
+
+    loaded, meta = load_arrays(tmp_path / 'model')
+    assert meta == {'version': 1}
+    np.testing.assert_array_equal(loaded['values'], np.zeros(2))
+
+def test_concurrent_loads_never_fail_or_mix_versions(tmp_path):
+    """Loads racing repeated saves always see one complete save."""
+    directory = tmp_path / 'model'
+    save_arrays(directory, {'values': np.zeros(4)}, {'version': 0})
+    done = threading.Event()
+
+    def keep_saving():
+        for version in range(1, 200):
+            save_arrays(directory, {'values': np.full(4, version)}, {'version': version})
+        done.set()
+
+    saver = threading.Thread(target=keep_saving)
+    saver.start()
+    while not done.is_set():
+        loaded, meta = load_arrays(directory)
+        np.testing.assert_array_equal(loaded['values'], np.full(4, meta['version']))
+    saver.join()
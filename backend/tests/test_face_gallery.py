@@ -0,0 +1,38 @@
+import numpy as np
+from config import Config
+from models.face_gallery import ExactIndex, FaceGallery, PartitionedIndex
+
+def _faces(count: int, seed: int) -> np.ndarray:
+    """Random encodings spread like real ones, far apart at tolerance 0.01."""
+    return np.random.default_rng(seed).normal(0, 0.1, (count, 128)).astype(np.float32)
+
+def test_replace_with_fewer_faces_rebuilds_the_index():
+    """Shrinking a gallery must not leave the index clustered over the removed rows."""
+    gallery = FaceGallery(index=PartitionedIndex(n_probes=1))
+    gallery.replace(_faces(2000, seed=1), [f"old{i}" for i in range(2000)])
+
+    faces = _faces(500, seed=2)
+    names = [f"new{i}" for i in range(500)]
+    gallery.replace(faces, names)
+    assert [name for name, _ in gallery.match(faces, 0.01)] == names
+
+def test_replace_with_as_many_faces_rebuilds_the_index():
+    """Replacing every row keeps the size the same but still invalidates the cells."""
+    gallery = FaceGallery(index=PartitionedIndex(n_probes=1))
+    gallery.replace(_faces(1000, seed=3), [f"old{i}" for i in range(1000)])
+
+    faces = _faces(1000, seed=4)
+    names = [f"new{i}" for i in range(1000)]
+    gallery.replace(faces, names)
+    assert [name for name, _ in gallery.match(faces, 0.01)] == names
+
+def test_auto_index_follows_gallery_size(monkeypatch):
+    """Automatic selection partitions large galleries and returns to exact search when they shrink."""
+    monkeypatch.setattr(Config, 'FACE_INDEX', 'auto')
+    monkeypatch.setattr(Config, 'FACE_INDEX_PARTITION_THRESHOLD', 1000)
+    gallery = FaceGallery()
+    gallery.add(_faces(1500, seed=5), [f"user{i}" for i in range(1500)])
+    assert isinstance(gallery.index, PartitionedIndex)
+
+    gallery.replace(_faces(10, seed=6), [f"user{i}" for i in range(10)])
+    assert isinstance(gallery.index, ExactIndex)
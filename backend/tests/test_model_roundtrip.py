@@ -0,0 +1,116 @@
+from functools import partial
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from benchmarks import labelled, training_corpora
+from config import Config
+from core.face_store import FaceEncodingStore
+from database.init_db import initialize_database
+from models.compact import export_pipeline, load_arrays, load_pipeline, save_arrays
+from models.emotion_detector import EmotionDetector
+from models.face_gallery import FaceGallery
+from models.features import analyze
+from models.nlp_model import NLPModel
+from utils import text_processing
+
+@pytest.fixture
+def corpora(temp_data, monkeypatch):
+    """The training script's corpora, preprocessed without building a lemma table."""
+    monkeypatch.setattr(text_processing, '_lemma_table', {})
+    return training_corpora()
+
+def _assert_same_predictions(loaded, reference, texts):
+    """Equal labels and float32-close probabilities in the same class order."""
+    assert list(loaded.classes_) == list(reference.classes_)
+    assert list(loaded.predict(texts)) == list(reference.predict(texts))
+    np.testing.assert_allclose(loaded.predict_proba(texts), reference.predict_proba(texts),
+                               rtol=1e-4, atol=1e-6)
+
+def _assert_mapped(path):
+    """Every array of a saved model loads memory-mapped."""
+    arrays, _ = load_arrays(path)
+    assert all(isinstance(array, np.memmap) for array in arrays.values())
+
+def test_intent_model_survives_save_and_load(corpora):
+    """A fresh NLPModel predicts what the fitted TF-IDF + NB Pipeline did."""
+    intent_data, _ = corpora
+    trained = NLPModel()
+    trained.train_model(intent_data)
+    assert isinstance(trained.pipeline, Pipeline)
+
+    loaded = NLPModel()
+    _assert_mapped(Config.NLP_MODEL_PATH)
+    texts = trained._model_inputs(labelled(intent_data)[0] + ["play some jazz for me"])
+    _assert_same_predictions(loaded.pipeline, trained.pipeline, texts)
+
+    phrases = labelled(intent_data)[0]
+    loaded_intents = loaded.predict_intents(phrases)
+    trained_intents = trained.predict_intents(phrases)
+    assert [intent for intent, _, _ in loaded_intents] == [intent for intent, _, _ in trained_intents]
+    np.testing.assert_allclose([confidence for _, confidence, _ in loaded_intents],
+                               [confidence for _, confidence, _ in trained_intents], rtol=1e-4)
+
+def test_linear_emotion_model_survives_save_and_load(corpora, monkeypatch):
+    """A fresh linear EmotionDetector predicts what the sklearn Pipeline it replaces did."""
+    monkeypatch.setattr(Config, 'EMOTION_ENGINE', 'linear')
+    _, emotion_data = corpora
+    texts, labels = labelled(emotion_data)
+    params = EmotionDetector.HYPERPARAMETERS
+    reference = Pipeline([
+        ('tfidf', TfidfVectorizer(
+            analyzer=partial(analyze, ngram_range=params['tfidf']['ngram_range'], lemmatize=False),
+            max_features=params['tfidf']['max_features']
+        )),
+        ('classifier', LogisticRegression(**params['linear']))
+    ])
+    reference.fit(texts, labels)
+
+    EmotionDetector().train_text_emotion_model(emotion_data)
+    loaded = EmotionDetector()
+    _assert_mapped(Config.EMOTION_LINEAR_MODEL_PATH)
+    _assert_same_predictions(loaded.text_pipeline, reference,
+                             texts + ["I can't believe this happened to me"])
+
+@pytest.mark.parametrize('labels', [None, ['joy', 'sadness']], ids=['multiclass', 'binary'])
+def test_logistic_regression_pipeline_survives_export(corpora, tmp_path, labels):
+    """Exported LogisticRegression pipelines, including the two-row binary case, predict alike."""
+    _, emotion_data = corpora
+    texts, targets = labelled(emotion_data)
+    if labels:
+        texts, targets = zip(*[(text, target) for text, target in zip(texts, targets)
+                               if target in labels])
+    pipeline = Pipeline([
+        ('tfidf', TfidfVectorizer(max_features=1000, ngram_range=(1, 2))),
+        ('classifier', LogisticRegression(**EmotionDetector.HYPERPARAMETERS['linear']))
+    ])
+    pipeline.fit(texts, targets)
+
+    save_arrays(tmp_path / 'model', *export_pipeline(pipeline))
+    arrays, meta = load_arrays(tmp_path / 'model')
+    assert all(isinstance(array, np.memmap) for array in arrays.values())
+    _assert_same_predictions(load_pipeline(arrays, meta), pipeline, list(texts))
+
+def test_face_encodings_survive_import_and_load(temp_data):
+    """Saved encodings, imported and loaded back, match queries exactly as the originals do."""
+    initialize_database()
+    rng = np.random.default_rng(0)
+    encodings = rng.normal(0, 0.1, (40, 128)).astype(np.float32)
+    names = [f"user{i % 10}" for i in range(40)]
+    save_arrays(Config.FACE_ENCODINGS_PATH,
+                {'encodings': encodings, 'names': np.array(names, dtype=str)}, {'format': 1})
+
+    arrays, _ = load_arrays(Config.FACE_ENCODINGS_PATH)
+    assert isinstance(arrays['encodings'], np.memmap)
+    store = FaceEncodingStore()
+    store.import_encodings(arrays['encodings'], [str(name) for name in arrays['names']])
+    _, loaded_names, loaded_encodings = store.load()
+    assert loaded_names == names
+    np.testing.assert_array_equal(loaded_encodings, encodings)
+
+    original, loaded = FaceGallery(), FaceGallery()
+    original.replace(encodings, names)
+    loaded.replace(loaded_encodings, loaded_names)
+    queries = np.vstack([encodings[::7] + 0.01, rng.normal(0, 0.1, (5, 128))]).astype(np.float32)
+    assert loaded.match(queries, 0.6) == original.match(queries, 0.6)
@@ -0,0 +1,39 @@
+import sqlite3
+import pytest
+from config import Config
+from database.migrations import HOT_QUERIES, apply_migrations, find_full_scans
+
+@pytest.fixture
+def conn():
+    """A fresh database built the way initialize_database builds one."""
+    conn = sqlite3.connect(":memory:")
+    with open(Config.DATABASE_DIR / "schemas.sql", 'r') as f:
+        conn.executescript(f.read())
+    apply_migrations(conn)
+    yield conn
+    conn.close()
+
+def test_every_hot_query_uses_an_index(conn):
+    """No hot query's plan scans a whole table."""
+    assert find_full_scans(conn) == {}
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_is_explainable(conn, name):
+    """Each hot query prepares against the migrated schema with its sample parameters."""
+    sql, params = HOT_QUERIES[name]
+    assert conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+
+def test_dropped_index_is_reported(conn):
+    """Losing an index surfaces as a scan, even where the query aliases its table."""
+    for index in ("idx_memory_user_rank", "idx_memory_user_type_rank",
+                  "idx_memory_user", "idx_memory_user_type"):
+        conn.execute(f"DROP INDEX {index}")
+
+    scans = find_full_scans(conn)
+    assert scans['retrieve_memories'].startswith("SCAN m")
+    assert scans['retrieve_memories_by_type'].startswith("SCAN m")
+
+def test_unindexed_table_scan_is_reported(conn):
+    """Scans of unaliased tables are reported too."""
+    conn.execute("DROP INDEX idx_events_user_pending")
+    assert find_full_scans(conn) == {'iter_upcoming_events': "SCAN events"}
@@ -0,0 +1,101 @@
+import pytest
+
+nltk = pytest.importorskip('nltk')
+
+from config import Config
+from benchmarks import training_corpora
+from utils import text_processing
+
+def _require(*resources):
+    for resource in resources:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            pytest.skip(f"NLTK data {resource} not installed")
+
+def _require_wordnet():
+    _require('corpora/wordnet')
+
+def _training_phrases() -> list:
+    """Every intent and emotion phrase the app and the training script train on."""
+    phrases = []
+    for source in (Config.BACKEND_DIR / "app.py", None):
+        for data in training_corpora(source):
+            for examples in next(iter(data.values())).values():
+                phrases.extend(examples)
+    return phrases
+
+def _nltk_preprocess(text: str, lemmatizer, stop_words) -> str:
+    """The NLTK pipeline preprocess() replaced."""
+    from nltk.tokenize import word_tokenize
+
+    text = text_processing._NON_ALPHA.sub('', text.lower())
+    return ' '.join(lemmatizer.lemmatize(token)
+                    for token in word_tokenize(text) if token not in stop_words)
+
+def test_preprocess_matches_nltk_on_training_phrases(temp_data, monkeypatch):
+    """preprocess() gives the old word_tokenize + WordNetLemmatizer output on every training phrase."""
+    _require('corpora/stopwords', 'corpora/wordnet')
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from nltk.tokenize import word_tokenize
+    try:
+        # Punkt's resource name differs between NLTK releases
+        word_tokenize("probe")
+    except LookupError:
+        pytest.skip("NLTK Punkt data not installed")
+
+    # Built fresh into the test's model directory
+    monkeypatch.setattr(text_processing, '_lemma_table', None)
+    lemmatizer = WordNetLemmatizer()
+    stop_words = set(stopwords.words('english'))
+
+    phrases = _training_phrases()
+    assert len(phrases) > 300
+    outputs = [(phrase, text_processing.preprocess(phrase),
+                _nltk_preprocess(phrase, lemmatizer, stop_words)) for phrase in phrases]
+    mismatches = [output for output in outputs if output[1] != output[2]]
+    assert not mismatches, mismatches[:10]
+
+def test_tokenize_matches_treebank_on_training_phrases():
+    """tokenize() splits normalized training phrases exactly as NLTK's Treebank tokenizer does."""
+    from nltk.tokenize import NLTKWordTokenizer
+
+    treebank = NLTKWordTokenizer()
+    for phrase in _training_phrases():
+        normalized = text_processing.normalize(phrase)
+        assert text_processing.tokenize(normalized) == treebank.tokenize(normalized), phrase
+
+def test_stop_words_match_nltk():
+    """STOP_WORDS is NLTK's English list minus forms with apostrophes."""
+    _require('corpora/stopwords')
+    from nltk.corpus import stopwords
+
+    assert text_processing.STOP_WORDS == {
+        word for word in stopwords.words('english') if "'" not in word
+    }
+
+def test_lemma_table_matches_wordnet_lemmatizer():
+    """Table lookups agree with WordNetLemmatizer on every word it could change."""
+    _require_wordnet()
+    from nltk.corpus import wordnet
+    from nltk.stem import WordNetLemmatizer
+
+    table = text_processing.build_lemma_table()
+    lemmatizer = WordNetLemmatizer()
+
+    # Every noun lemma, a plural of it and every irregular form
+    words = set(wordnet._exception_map['n'])
+    for lemma in wordnet.all_lemma_names(pos='n'):
+        if lemma.isascii() and lemma.isalpha():
+            words.update((lemma, lemma + 's', lemma + 'es'))
+    words.update(['running', 'was', 'geese', 'mice', 'analyses', 'wolves', 'xyzzys'])
+
+    mismatches = [word for word in words
+                  if table.get(word, word) != lemmatizer.lemmatize(word)]
+    assert not mismatches, mismatches[:20]
+
+def test_preprocess_without_table_keeps_tokens(monkeypatch):
+    """With no lemma table, preprocess still tokenizes and drops stopwords."""
+    monkeypatch.setattr(text_processing, '_lemma_table', {})
+    assert text_processing.preprocess("The Cats can't jump!") == "cats cant jump"
@@ -0,0 +1,45 @@
+from config import Config
+from core.vector_index import HashingEncoder, VectorIndex
+from core.memory_manager import MemoryManager
+from database.init_db import initialize_database
+
+def test_store_memory_embeds_before_any_search(temp_data):
+    """A stored memory is in the semantic index as soon as store_memory returns."""
+    initialize_database()
+    manager = MemoryManager(user_id="alice", write_behind=False)
+    try:
+        assert manager.store_memory("my sister lives in Lisbon")
+        index = manager._get_vector_index()
+        assert index.count == 1
+
+        hits = manager.semantic_search("sister Lisbon", limit=1)
+        assert [memory['content'] for memory in hits] == ["my sister lives in Lisbon"]
+        assert index.count == 1
+    finally:
+        manager.close()
+
+def test_queued_memory_is_embedded_when_its_batch_commits(temp_data):
+    """With write-behind on, the commit callback embeds the row."""
+    initialize_database()
+    manager = MemoryManager(user_id="bob", write_behind=True)
+    try:
+        assert manager.store_memory("the spare key is under the mat")
+        assert manager.write_queue.flush(timeout=5)
+        assert manager._get_vector_index().count == 1
+    finally:
+        manager.close()
+
+def test_partitions_train_in_the_background(temp_data, monkeypatch):
+    """Crossing the threshold trains partitions off the caller's thread; search keeps working."""
+    monkeypatch.setattr(Config, 'VECTOR_IVF_THRESHOLD', 400)
+    index = VectorIndex(temp_data / "index", HashingEncoder(64))
+    texts = [f"memory number {i} about topic{i % 37}" for i in range(500)]
+    index.add(list(range(1, 501)), texts)
+
+    assert index.wait_for_partitions(timeout=30)
+    assert index.centroids is not None and index.trained_count == 500
+    assert index.search(["memory number 123 about topic12"], k=1)[0][0][0] == 124
+
+    # Reopened from disk, the partitions are reused
+    reopened = VectorIndex(temp_data / "index", HashingEncoder(64))
+    assert reopened.centroids is not None and reopened.count == 500
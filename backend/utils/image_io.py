@@ -0,0 +1,66 @@
+import binascii
+import threading
+import cv2
+import numpy as np
+
+# JPEG decoders can skip DCT detail to produce a 1/2, 1/4 or 1/8 size image directly
+_REDUCED_FLAGS = {
+    'color': {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+              4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8},
+    'gray': {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+             4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8},
+}
+# OpenCV 4.10+ can decode straight to RGB, but not combined with a reduction
+_IMREAD_COLOR_RGB = getattr(cv2, 'IMREAD_COLOR_RGB', None)
+
+_buffers = threading.local()
+
+def encoded_bytes(data) -> np.ndarray:
+    """Encoded image bytes of a data URL, base64 text or raw bytes, as a uint8 array.
+
+    Raw bytes are used in place, and a bytes data URL is base64-decoded
+    straight from a memoryview of its payload.
+    """
+    if isinstance(data, str):
+        if not data.startswith('data:'):
+            return np.frombuffer(binascii.a2b_base64(data), dtype=np.uint8)
+        comma = data.find(',', 0, 256)
+        payload = data[comma + 1:]
+    else:
+        view = memoryview(data).cast('B')
+        if view[:5] != b'data:':
+            return np.frombuffer(view, dtype=np.uint8)
+        # The header is short; only it is copied to find the comma
+        comma = bytes(view[:256]).find(b',')
+        payload = view[comma + 1:]
+    if comma < 0:
+        raise ValueError("Data URL has no payload")
+    return np.frombuffer(binascii.a2b_base64(payload), dtype=np.uint8)
+
+def _reused(name: str, shape: tuple) -> np.ndarray:
+    """The calling thread's conversion buffer of a shape, reallocated only when it changes."""
+    buffer = getattr(_buffers, name, None)
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.uint8)
+        setattr(_buffers, name, buffer)
+    return buffer
+
+def decode_image(data, color: str = 'rgb', reduction: int = 1) -> np.ndarray:
+    """Decode an image held in memory, without temporary files.
+
+    `color` is 'rgb', 'bgr' or 'gray'; `reduction` (1, 2, 4 or 8) shrinks
+    the image while it is decoded. A converted image may live in a buffer
+    that the calling thread's next decode overwrites, so copy it if it must
+    outlive that.
+    """
+    buffer = encoded_bytes(data)
+    if color == 'rgb' and reduction == 1 and _IMREAD_COLOR_RGB is not None:
+        image = cv2.imdecode(buffer, _IMREAD_COLOR_RGB)
+    else:
+        image = cv2.imdecode(buffer, _REDUCED_FLAGS['gray' if color == 'gray' else 'color'][reduction])
+    if image is None:
+        raise ValueError("Could not decode image data")
+
+    if color == 'rgb' and (reduction != 1 or _IMREAD_COLOR_RGB is None):
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=_reused('rgb', image.shape))
+    return image
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List
+from config import Config
+
+_NON_ALPHA = re.compile(r'[^a-zA-Z\s]')
+
+# Fused forms the Treebank tokenizer splits in two; after _NON_ALPHA only these
+# of its contraction rules can still match
+_FUSED_WORDS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na')
+}
+
+# NLTK's English stopword list minus the apostrophe forms, which can never
+# match once punctuation has been stripped
+STOP_WORDS = frozenset("""
+    i me my myself we our ours ourselves you your yours yourself yourselves
+    he him his himself she her hers herself it its itself they them their
+    theirs themselves what which who whom this that these those am is are was
+    were be been being have has had having do does did doing a an the and but
+    if or because as until while of at by for with about against between into
+    through during before after above below to from up down in out on off over
+    under again further then once here there when where why how all any both
+    each few more most other some such no nor not only own same so than too
+    very s t can will just don should now d ll m o re ve y ain aren couldn
+    didn doesn hadn hasn haven isn ma mightn mustn needn shan shouldn wasn
+    weren won wouldn
+""".split())
+
+# WordNet's noun detachment rules as (inflected suffix, base suffix)
+_NOUN_SUFFIXES = [
+    ('s', ''), ('ses', 's'), ('ves', 'f'), ('xes', 'x'), ('zes', 'z'),
+    ('ches', 'ch'), ('shes', 'sh'), ('men', 'man'), ('ies', 'y')
+]
+
+_lemma_table = None
+_lemma_lock = threading.Lock()
+
+def normalize(text: str) -> str:
+    """Lowercase and drop everything except letters and whitespace."""
+    return _NON_ALPHA.sub('', text.lower())
+
+def cache_key(text: str) -> str:
+    """Normalized text with whitespace collapsed; equal keys preprocess identically."""
+    return ' '.join(normalize(text).split())
+
+def tokenize(text: str) -> List[str]:
+    """Split normalized text into tokens the way NLTK's word_tokenize would."""
+    tokens = []
+    for word in text.split():
+        if word in _FUSED_WORDS:
+            tokens.extend(_FUSED_WORDS[word])
+        else:
+            tokens.append(word)
+    return tokens
+
+def _ensure_wordnet():
+    """Download the WordNet corpus if this machine does not have it yet."""
+    import nltk
+
+    try:
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        if not nltk.download('wordnet', quiet=True):
+            raise LookupError("WordNet corpus is missing and could not be downloaded")
+
+def build_lemma_table() -> Dict[str, str]:
+    """Map every noun form WordNet would lemmatize differently to its lemma.
+
+    Candidates are the irregular plurals plus each noun lemma run backwards
+    through the detachment rules; the real lemmatizer decides each one, so
+    lookups reproduce WordNetLemmatizer.lemmatize() exactly.
+    """
+    _ensure_wordnet()
+    from nltk.corpus import wordnet
+    from nltk.stem import WordNetLemmatizer
+
+    lemmatizer = WordNetLemmatizer()
+    candidates = set(wordnet._exception_map['n'])
+    for lemma in wordnet.all_lemma_names(pos='n'):
+        # Tokens are ASCII letters only, so nothing else can ever be looked up
+        if not (lemma.isascii() and lemma.isalpha()):
+            continue
+        for inflected, base in _NOUN_SUFFIXES:
+            if lemma.endswith(base):
+                candidates.add(lemma[:len(lemma) - len(base)] + inflected)
+
+    table = {}
+    for word in candidates:
+        if word.isascii() and word.isalpha():
+            lemma = lemmatizer.lemmatize(word)
+            if lemma != word:
+                table[word] = lemma
+    return table
+
+def save_lemma_table(table: Dict[str, str]):
+    """Write the lemma table where get_lemma_table looks for it."""
+    os.makedirs(os.path.dirname(Config.LEMMA_TABLE_PATH), exist_ok=True)
+    temp_path = f"{Config.LEMMA_TABLE_PATH}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(table, f, separators=(',', ':'), sort_keys=True)
+    os.replace(temp_path, Config.LEMMA_TABLE_PATH)
+
+def get_lemma_table() -> Dict[str, str]:
+    """Load the lemma table, building and saving it from WordNet on first use."""
+    global _lemma_table
+    if _lemma_table is not None:
+        return _lemma_table
+
+    with _lemma_lock:
+        if _lemma_table is not None:
+            return _lemma_table
+        try:
+            with open(Config.LEMMA_TABLE_PATH, 'r') as f:
+                _lemma_table = json.load(f)
+            return _lemma_table
+        except (FileNotFoundError, ValueError):
+            pass
+
+        try:
+            table = build_lemma_table()
+        except (ImportError, LookupError, OSError) as e:
+            # Only this process goes without; nothing empty is saved, so the
+            # next start (or python -m utils.text_processing) tries again
+            print(f"Error building lemma table, words will not be lemmatized: {e}")
+            table = {}
+        else:
+            try:
+                save_lemma_table(table)
+            except OSError as e:
+                print(f"Error saving lemma table: {e}")
+        _lemma_table = table
+        return _lemma_table
+
+def preprocess(text: str) -> str:
+    """Normalize, tokenize, drop stopwords and lemmatize into a single string."""
+    lemmas = get_lemma_table()
+    return ' '.join(
+        lemmas.get(token, token) for token in tokenize(normalize(text))
+        if token not in STOP_WORDS
+    )
+
+if __name__ == "__main__":
+    # Build (or rebuild) the table ahead of time so deployments never need NLTK data
+    table = build_lemma_table()
+    save_lemma_table(table)
+    print(f"{len(table)} lemma entries in {Config.LEMMA_TABLE_PATH}")
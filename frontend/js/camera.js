@@ -43,22 +43,130 @@ class CameraHandler {
     this.isActive = false;
   }
 
-  captureFrame() {
-    if (!this.video || !this.canvas) return null;
+  drawFrame(maxWidth = Infinity) {
+    if (!this.video || !this.canvas || !this.video.videoWidth) return false;
 
+    // Scale down to at most maxWidth, keeping the aspect ratio
+    const scale = Math.min(1, maxWidth / this.video.videoWidth);
     const context = this.canvas.getContext("2d");
-    this.canvas.width = this.video.videoWidth;
-    this.canvas.height = this.video.videoHeight;
+    this.canvas.width = Math.round(this.video.videoWidth * scale);
+    this.canvas.height = Math.round(this.video.videoHeight * scale);
 
-    context.drawImage(this.video, 0, 0);
+    context.drawImage(this.video, 0, 0, this.canvas.width, this.canvas.height);
+    return true;
+  }
+
+  captureFrame(maxWidth = Infinity, quality = 0.8) {
+    if (!this.drawFrame(maxWidth)) return null;
+
+    return this.canvas.toDataURL("image/jpeg", quality);
+  }
+
+  captureFrameBlob(maxWidth = Infinity, quality = 0.8) {
+    // Binary JPEG, without the base64 text a data URL carries
+    if (!this.drawFrame(maxWidth)) return Promise.resolve(null);
 
-    return this.canvas.toDataURL("image/jpeg", 0.8);
+    return new Promise((resolve) =>
+      this.canvas.toBlob(resolve, "image/jpeg", quality)
+    );
   }
 }
 
 // Global camera handler
 const cameraHandler = new CameraHandler();
 
+// Streams camera frames to the backend for authentication at a fixed rate.
+// At most one frame is in flight. Ticks that arrive meanwhile only mark a
+// frame as pending, and that frame is captured once the backend answers, so
+// a slow backend gets the newest frame rather than a growing queue.
+class FrameStreamer {
+  constructor(camera, onResult) {
+    this.camera = camera;
+    this.onResult = onResult;
+    this.config = null;
+    this.timer = null;
+    this.inFlight = false;
+    this.pending = false;
+  }
+
+  async start() {
+    if (!this.config) {
+      this.config = await eel.get_camera_config()();
+    }
+    this.stop();
+    this.timer = setInterval(() => this.tick(), 1000 / this.config.fps);
+  }
+
+  stop() {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+    this.pending = false;
+  }
+
+  tick() {
+    if (this.inFlight) {
+      this.pending = true;
+      return;
+    }
+    this.send();
+  }
+
+  async send() {
+    this.inFlight = true;
+    try {
+      const result = await this.authenticate();
+      if (result && this.timer) {
+        this.onResult(result);
+      }
+    } catch (error) {
+      console.error("Frame streaming error:", error);
+    } finally {
+      this.inFlight = false;
+    }
+
+    if (this.pending && this.timer) {
+      this.pending = false;
+      this.send();
+    }
+  }
+
+  async authenticate() {
+    const { transport, endpoint, width, quality } = this.config;
+
+    if (transport === "binary") {
+      const blob = await this.camera.captureFrameBlob(width, quality);
+      if (!blob) return null;
+
+      const response = await fetch(endpoint, {
+        method: "POST",
+        headers: { "Content-Type": "image/jpeg" },
+        body: blob,
+      });
+      return response.json();
+    }
+
+    const imageData = this.camera.captureFrame(width, quality);
+    if (!imageData) return null;
+    return eel.authenticate_with_face(imageData)();
+  }
+}
+
+const frameStreamer = new FrameStreamer(cameraHandler, (result) => {
+  if (result.authenticated) {
+    onFaceAuthenticated(result);
+  }
+});
+
+function onFaceAuthenticated(result) {
+  app.isAuthenticated = true;
+  app.currentUser = result.user;
+  app.updateUI();
+  app.showNotification(`Welcome back, ${result.user}!`, "success");
+  closeFaceAuth();
+}
+
 // Face authentication functions
 async function startFaceAuth() {
   const modal = document.getElementById("faceAuthModal");
@@ -67,12 +175,21 @@ async function startFaceAuth() {
   const started = await cameraHandler.startCamera();
   if (!started) {
     closeFaceAuth();
+    return;
+  }
+
+  // Authenticate continuously while the camera is open
+  try {
+    await frameStreamer.start();
+  } catch (error) {
+    console.error("Could not start frame streaming:", error);
   }
 }
 
 function closeFaceAuth() {
   const modal = document.getElementById("faceAuthModal");
   modal.classList.remove("active");
+  frameStreamer.stop();
   cameraHandler.stopCamera();
 
   // Hide register form
@@ -95,11 +212,7 @@ async function authenticateWithFace() {
     const result = await eel.authenticate_with_face(imageData)();
 
     if (result.authenticated) {
-      app.isAuthenticated = true;
-      app.currentUser = result.user;
-      app.updateUI();
-      app.showNotification(`Welcome back, ${result.user}!`, "success");
-      closeFaceAuth();
+      onFaceAuthenticated(result);
     } else {
       app.showNotification(result.message || "Authentication failed", "error");
     }